@@ -8,7 +8,7 @@ from simulator import Simulator
 
 # 0. initialization
 opt = Options()
-sim = Simulator(opt.map_ind, opt.cub_siz, opt.pob_siz, opt.act_num)
+sim = Simulator(opt.map_ind, opt.cub_siz, opt.pob_siz, opt.act_num, obs_mode=opt.obs_mode)
 
 # 1. demo control loop
 if opt.disp_on:
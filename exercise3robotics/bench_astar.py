@@ -0,0 +1,84 @@
+import numpy as np
+import time
+from random import randrange, seed
+# custom modules
+from simulator import Simulator
+
+# compares Simulator.astar against the original linear scan A* on maps 0 and 1:
+# checks that both return the same astar_act_lst for random (bot, tgt) pairs and times them
+
+n_queries = 2000
+map_cfg = {0: (5, 5), 1: (10, 3)} # map_ind: (cub_siz, pob_siz)
+act_num = 5
+
+def astar_ref(sim, bot_y, bot_x, tgt_y, tgt_x):
+    # the original implementation, kept here as reference
+    def astar_act(bot_y, bot_x, act_ind):
+        bot_pos_new = np.ndarray(sim.state_dim, int)
+        bot_pos_new[0] = bot_y + sim.act_pos_ind[act_ind][0]
+        bot_pos_new[1] = bot_x + sim.act_pos_ind[act_ind][1]
+        if bot_pos_new[0] == tgt_y and bot_pos_new[1] == tgt_x: # reaching tgt
+            return (bot_pos_new[0], bot_pos_new[1]), True
+        elif sim.map[bot_pos_new[0]][bot_pos_new[1]] == 1: # collision
+            return (bot_y, bot_x), False
+        else:
+            return (bot_pos_new[0], bot_pos_new[1]), False
+
+    open_list = {} # (y, x): fVal
+    clsd_list = {} # (y, x): fVal
+    gVal_list = {} # (y, x): gVal
+    came_from = {} # (neighb_y, neighb_x): ((active_y, active_x), act_ind)
+    active_pose = (bot_y, bot_x)
+    gVal_list[active_pose] = 0
+    open_list[active_pose] = sim.get_h_val(active_pose, tgt_y, tgt_x)
+    while len(open_list) > 0:
+        min_fVal = None
+        for k, v in open_list.items():
+            if min_fVal is None or v < min_fVal:
+                min_pose = k
+                min_fVal = v
+        active_pose = min_pose
+        clsd_list[active_pose] = open_list.pop(active_pose)
+        for act_ind in range(sim.act_num):
+            neighb_pose, terminal = astar_act(active_pose[0], active_pose[1], act_ind)
+            if terminal:
+                came_from[neighb_pose] = (active_pose, act_ind)
+                act_lst = []
+                tmp_pose = (tgt_y, tgt_x)
+                while tmp_pose != (bot_y, bot_x):
+                    act_lst.append(came_from[tmp_pose][1])
+                    tmp_pose = came_from[tmp_pose][0]
+                return act_lst
+            if neighb_pose != active_pose and not neighb_pose in clsd_list:
+                neighb_g = gVal_list[active_pose] + 1
+                neighb_f = neighb_g + sim.get_h_val(neighb_pose, tgt_y, tgt_x)
+                if not neighb_pose in open_list or open_list[neighb_pose] >= neighb_f:
+                    open_list[neighb_pose] = neighb_f
+                    gVal_list[neighb_pose] = neighb_g
+                    came_from[neighb_pose] = (active_pose, act_ind)
+    return None
+
+seed(0)
+for map_ind in sorted(map_cfg):
+    cub_siz, pob_siz = map_cfg[map_ind]
+    sim = Simulator(map_ind, cub_siz, pob_siz, act_num)
+    queries = []
+    for i in range(n_queries):
+        bot = sim.fre_pos[randrange(sim.fre_pos.shape[0])]
+        tgt = sim.fre_pos[randrange(sim.fre_pos.shape[0])]
+        queries.append((bot[0], bot[1], tgt[0], tgt[1]))
+
+    start = time.time()
+    ref_lst = [astar_ref(sim, *query) for query in queries]
+    ref_time = time.time() - start
+
+    start = time.time()
+    new_lst = []
+    for query in queries:
+        sim.astar(*query)
+        new_lst.append(list(sim.astar_act_lst))
+    new_time = time.time() - start
+
+    assert ref_lst == new_lst, "astar action sequences differ from the reference"
+    print("map %d: %d queries, reference %.3fs, heap %.3fs (%.1fx), identical action sequences"
+          % (map_ind, n_queries, ref_time, new_time, ref_time / new_time))
@@ -0,0 +1,86 @@
+import numpy as np
+import time
+# custom modules
+from simulator import Simulator
+from maps      import generate_maze, register_map
+
+# times Simulator setup (reset_map: map parsing, A* neighbours & drawing the screen), steps
+# and A* (newGame) on generated mazes of growing size, the setup is compared to the
+# original per cell loops (reset_map_ref) for the smaller sizes
+# NOTE: the mazes get walls of pob_siz // 2 cells, so that every pob lies inside the map
+
+map_sizes = [32, 64, 128, 256, 512, 1000]
+ref_max_size = 256 # the loops get slow beyond that
+cub_siz, pob_siz = 5, 5
+obs_mode = "grid"  # "pixel" works as well, the screen then takes (map_siz * cub_siz)^2 * 3 bytes
+act_num = 5
+n_steps = 20000
+n_astar = 20
+
+def reset_map_ref(sim):
+    # the original map parsing, neighbour lists & screen drawing, kept here as reference
+    obj_ind, fre_ind = sim.obs_ind, 0
+    for y in range(sim.map_hei):
+        for x in range(sim.map_wid):
+            if sim.map[y][x] == 1:
+                sim.obj_pos[obj_ind][0] = y
+                sim.obj_pos[obj_ind][1] = x
+                obj_ind += 1
+            else:
+                sim.fre_pos[fre_ind][0] = y
+                sim.fre_pos[fre_ind][1] = x
+                fre_ind += 1
+    map_lst = sim.map.tolist()
+    nbr_lst = [[] for _ in range(sim.map_hei * sim.map_wid)]
+    for y in range(1, sim.map_hei - 1):
+        for x in range(1, sim.map_wid - 1):
+            for act_ind in range(1, sim.act_num):
+                neighb_y = y + int(sim.act_pos_ind[act_ind][0])
+                neighb_x = x + int(sim.act_pos_ind[act_ind][1])
+                if map_lst[neighb_y][neighb_x] != 1:
+                    nbr_lst[y * sim.map_wid + x].append((act_ind, neighb_y * sim.map_wid + neighb_x))
+    sim.state_screen = np.zeros((sim.map_hei*sim.drw_siz, sim.map_wid*sim.drw_siz, 3), dtype=np.uint8)
+    for obj_ind in range(sim.obs_ind, sim.obj_num):
+        sim.draw_cube(sim.obj_pos[obj_ind][0], sim.obj_pos[obj_ind][1], sim.obs_clr_ind, 255)
+
+print("  size  #free    gen    reset  reset_ref   steps/s   A* (ms)  A* len")
+for map_siz in map_sizes:
+    start = time.time()
+    map_ind = register_map(generate_maze(map_siz, map_siz, seed=map_siz, wall_siz=pob_siz // 2, loop_prob=0.05),
+                           min_border=pob_siz // 2)
+    t_gen = time.time() - start
+
+    start = time.time()
+    sim = Simulator(map_ind, cub_siz, pob_siz, act_num, obs_mode=obs_mode, seed=0)
+    t_reset = time.time() - start
+    if map_siz <= ref_max_size:
+        start = time.time()
+        reset_map_ref(sim)
+        t_ref = "%9.3fs" % (time.time() - start)
+    else:
+        t_ref = "%10s" % "-"
+
+    # A*: newGame plans the path between random tgt & bot positions
+    start = time.time()
+    astar_len = 0
+    for _ in range(n_astar):
+        sim.newGame(None, None)
+        astar_len += len(sim.astar_act_lst)
+    t_astar = (time.time() - start) / n_astar
+
+    actions = np.random.RandomState(0).randint(act_num, size=n_steps).tolist()
+    start = time.time()
+    for action in actions:
+        sim.step(action)
+    t_steps = time.time() - start
+
+    # every pob is complete (the bot never sees past the border)
+    pob_len = pob_siz * (1 if obs_mode == "grid" else cub_siz)
+    for _ in range(100):
+        assert sim.newGame(None, None).pob.shape == (pob_len, pob_len, 3)
+        for action in range(act_num):
+            assert sim.step(action).pob.shape == (pob_len, pob_len, 3)
+
+    print("%6d %6d %6.3fs %7.3fs %s %9.0f %9.2f %7.0f"
+          % (map_siz, sim.fre_pos.shape[0], t_gen, t_reset, t_ref, n_steps / t_steps,
+             t_astar * 1000, astar_len / float(n_astar)))
@@ -0,0 +1,95 @@
+import numpy as np
+import copy
+import time
+# custom modules
+from simulator import Simulator
+
+# times branching a Simulator for lookahead: Simulator.snapshot() / restore() against
+# copy.deepcopy and building a new Simulator per branch, on maps 0 and 1, and checks that
+# a full depth lookahead over all actions gives the same returns w/ restore() & deepcopy
+
+n_branch = 2000
+depth = 3
+map_cfg = {0: (5, 5), 1: (10, 3)} # map_ind: (cub_siz, pob_siz)
+act_num = 5
+
+def lookahead(sim, depth, branch): # best return of all action sequences of length depth
+    if depth == 0:
+        return 0.
+    best = None
+    for action in range(act_num):
+        child = branch(sim)
+        state = child.step(action)
+        ret = state.reward
+        if not state.terminal:
+            ret += lookahead(child, depth - 1, branch)
+        best = ret if best is None else max(best, ret)
+    return best
+
+def lookahead_restore(sim, depth):
+    # lookahead w/ a single simulator, the children of a node are explored one after the other
+    if depth == 0:
+        return 0.
+    snap = sim.snapshot(rng=False)
+    best = None
+    for action in range(act_num):
+        sim.restore(snap)
+        state = sim.step(action)
+        ret = state.reward
+        if not state.terminal:
+            ret += lookahead_restore(sim, depth - 1)
+        best = ret if best is None else max(best, ret)
+    sim.restore(snap)
+    return best
+
+for map_ind, (cub_siz, pob_siz) in map_cfg.items():
+    sim = Simulator(map_ind, cub_siz, pob_siz, act_num, seed=0)
+    sim.newGame(None, None)
+    rng = np.random.RandomState(0)
+    actions = rng.randint(act_num, size=n_branch)
+
+    start = time.time()
+    for action in actions:
+        snap = sim.snapshot()
+        sim.step(action)
+        sim.restore(snap)
+    t_restore = time.time() - start
+
+    start = time.time()
+    for action in actions[:n_branch // 10]:
+        child = copy.deepcopy(sim)
+        child.step(action)
+    t_deepcopy = (time.time() - start) * 10
+
+    bot_y, bot_x = sim.obj_pos[sim.bot_ind]
+    tgt_y, tgt_x = sim.obj_pos[sim.tgt_ind]
+    start = time.time()
+    for action in actions[:n_branch // 100]:
+        child = Simulator(map_ind, cub_siz, pob_siz, act_num)
+        child.newGame(tgt_y, tgt_x, bot_y, bot_x)
+        child.step(action)
+    t_new = (time.time() - start) * 100
+
+    # lookahead from a few start states, the returns must agree
+    start_states = []
+    for _ in range(20):
+        sim.newGame(None, None)
+        start_states.append(sim.snapshot())
+    start = time.time()
+    ret_restore = []
+    for snap in start_states:
+        sim.restore(snap)
+        ret_restore.append(lookahead_restore(sim, depth))
+    t_look_restore = time.time() - start
+    start = time.time()
+    ret_deepcopy = []
+    for snap in start_states:
+        sim.restore(snap)
+        ret_deepcopy.append(lookahead(sim, depth, copy.deepcopy))
+    t_look_deepcopy = time.time() - start
+    assert np.allclose(ret_restore, ret_deepcopy)
+
+    print("map %d: branch + step + rollback: restore %8.0f/s, deepcopy %8.0f/s, new Simulator %6.0f/s"
+          % (map_ind, n_branch / t_restore, n_branch / t_deepcopy, n_branch / t_new))
+    print("       depth %d lookahead over %d states: restore %.3fs, deepcopy %.3fs (same returns)"
+          % (depth, len(start_states), t_look_restore, t_look_deepcopy))
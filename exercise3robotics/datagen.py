@@ -0,0 +1,137 @@
+import numpy as np
+import multiprocessing as mp
+import json
+import os
+# custom modules
+from simulator import Simulator
+from oracle    import DistanceOracle
+from atlas     import ObsAtlas
+from dataset   import DatasetWriter, frame_kind, merge
+from trajlog   import TrajectoryWriter, merge_logs
+
+# expert data collection, split into shards that are collected by separate worker processes
+# NOTE: every shard has its own seed derived from one root seed, so for a given seed and
+# NOTE: number of workers the merged dataset is always the same
+
+def shard_seeds(seed, n_workers): # root seed -> (root entropy, one independent seed per shard)
+    seed_seq = np.random.SeedSequence(seed)
+    return seed_seq.entropy, [int(child.generate_state(1)[0]) for child in seed_seq.spawn(n_workers)]
+
+def shard_steps(n_steps, n_workers): # split n_steps as evenly as possible
+    return [n_steps // n_workers + (1 if i < n_steps % n_workers else 0) for i in range(n_workers)]
+
+def collect_shard(opt, n_steps, seed, out):
+    # runs the A* (or oracle) expert for n_steps like get_data.py always did and streams the steps
+    # into the binary dataset in directory out (or, for data_fmt "traj", only logs the episodes
+    # into the trajectory log file out), returns the indices at which new episodes start
+    oracle = DistanceOracle(opt.oracle_mem) if opt.use_oracle else None
+    sim = Simulator(opt.map_ind, opt.cub_siz, opt.pob_siz, opt.act_num, oracle, opt.obs_mode, seed)
+    log_only = opt.data_fmt == "traj"
+    if log_only:
+        writer = TrajectoryWriter(out)
+    else:
+        # pob lookup table, gives exactly the pob & rgb2gray(state.pob) w/o rendering
+        atlas = ObsAtlas(opt.map_ind, opt.cub_siz, opt.pob_siz, gray_dtype=np.float32, obs_mode=opt.obs_mode)
+        if frame_kind(opt.frame_dtype) == "rgb": # store pob or gray
+            frame_ind, frame_shape = 0, atlas.pob_atlas.shape[1:]
+        else:
+            frame_ind, frame_shape = 1, atlas.gray_atlas.shape[1:]
+        writer = DatasetWriter(out, frame_shape, opt.frame_dtype)
+    episode_starts = []
+    episode = 0
+
+    if opt.disp_on:
+        win_all = None
+        win_pob = None
+    epi_step = 0    # #steps in current episode
+
+    state = sim.newGame(opt.tgt_y, opt.tgt_x)
+    if log_only: # the newGame frame of the first episode is not collected
+        writer.new_episode(opt.map_ind, *sim.obj_pos[sim.tgt_ind], *sim.obj_pos[sim.bot_ind], skip=1)
+    for step in range(n_steps):
+        if state.terminal or epi_step >= opt.early_stop:
+            epi_step = 0
+            episode_starts.append(step)
+            episode += 1
+            state = sim.newGame(opt.tgt_y, opt.tgt_x)
+            if log_only:
+                writer.new_episode(opt.map_ind, *sim.obj_pos[sim.tgt_ind], *sim.obj_pos[sim.bot_ind])
+        else:
+            state = sim.step() # will perform A* (or oracle) actions
+            if log_only:
+                writer.append(state.action)
+
+        # save data & label
+        if not log_only:
+            writer.append(atlas.lookup_sim(sim)[frame_ind], state.action, episode)
+
+        epi_step += 1
+
+        if step % opt.prog_freq == 0:
+            print(step)
+
+        if opt.disp_on:
+            if win_all is None:
+                import pylab as pl
+                pl.figure()
+                win_all = pl.imshow(state.screen)
+                pl.figure()
+                win_pob = pl.imshow(state.pob)
+            else:
+                win_all.set_data(state.screen)
+                win_pob.set_data(state.pob)
+            pl.pause(opt.disp_interval)
+            pl.draw()
+
+    writer.close()
+    return episode_starts
+
+def collect_shard_star(args): # worker entry point, each worker writes its own shard
+    return collect_shard(*args)
+
+def collect(opt, n_steps, n_workers=1, seed=None, shard_dir=None, out=None):
+    # collects n_steps split over n_workers processes (in this process for n_workers == 1)
+    # into out (see collect_shard), returns a manifest describing the shards
+    entropy, seeds = shard_seeds(seed, n_workers)
+    steps = shard_steps(n_steps, n_workers)
+    manifest = {"seed": entropy,
+                "n_workers": n_workers,
+                "map_ind": opt.map_ind,
+                "tgt": [opt.tgt_y, opt.tgt_x],
+                "data_steps": n_steps,
+                "shards": [],
+                "episode_starts": []}
+    if n_workers == 1:
+        shards = [collect_shard(opt, steps[0], seeds[0], out)]
+    else:
+        if not os.path.isdir(shard_dir):
+            os.makedirs(shard_dir)
+        shard_ext = ".traj.npz" if opt.data_fmt == "traj" else ""
+        shard_outs = [os.path.join(shard_dir, "shard_%03d%s" % (i, shard_ext)) for i in range(n_workers)]
+        jobs = [(opt, steps[i], seeds[i], shard_outs[i]) for i in range(n_workers)]
+        pool = mp.get_context("fork").Pool(n_workers)
+        try:
+            shards = pool.map(collect_shard_star, jobs)
+        finally:
+            pool.close()
+            pool.join()
+        # merge shards in order
+        if opt.data_fmt == "traj":
+            merge_logs(shard_outs, out)
+        else:
+            merge(shard_outs, out)
+    offset = 0
+    for i, episode_starts in enumerate(shards):
+        # each shard starts w/ a new episode
+        manifest["shards"].append({"worker": i,
+                                   "seed": seeds[i],
+                                   "offset": offset,
+                                   "steps": steps[i],
+                                   "episode_starts": episode_starts})
+        manifest["episode_starts"] += [offset + start for start in sorted(set([0] + episode_starts))]
+        offset += steps[i]
+    return manifest
+
+def save_manifest(manifest, manifest_fil):
+    with open(manifest_fil, "w") as f:
+        json.dump(manifest, f, indent=1)
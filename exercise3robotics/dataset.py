@@ -0,0 +1,152 @@
+import numpy as np
+import json
+import os
+# custom modules
+from utils import rgb2gray
+
+# binary dataset format: a directory holding
+#   header.json  : size & shapes/dtypes of the arrays below
+#   frames.bin   : one frame per step, float32 grayscale pobs (state_siz) or uint8 rgb pobs (pob_h x pob_w x 3)
+#   labels.bin   : int8 action taken in each step (0 at the first step of an episode)
+#   episodes.bin : int32 episode id of each step
+# the arrays are raw C-order data, so they can be appended to in chunks and loaded w/ np.memmap
+
+header_fil   = "header.json"
+frames_fil   = "frames.bin"
+labels_fil   = "labels.bin"
+episodes_fil = "episodes.bin"
+label_dtype   = np.int8
+episode_dtype = np.int32
+
+def frame_kind(frame_dtype): # what is stored for the given frame dtype
+    return "rgb" if np.dtype(frame_dtype) == np.uint8 else "gray"
+
+
+class DatasetWriter:
+
+    # streams steps into a binary dataset, chunk_siz steps at a time
+    # NOTE: the header is rewritten after each chunk, so the dataset is readable while it is being written
+
+    def __init__(self, data_dir, frame_shape, frame_dtype="float32", chunk_siz=4096):
+        self.data_dir = data_dir
+        self.frame_shape = tuple(frame_shape)
+        self.frame_dtype = np.dtype(frame_dtype)
+        self.chunk_siz = chunk_siz
+        self.size = 0 # #steps written to disk
+        self.fill = 0 # #steps in the current chunk
+        self.frames   = np.zeros((chunk_siz,) + self.frame_shape, dtype=self.frame_dtype)
+        self.labels   = np.zeros(chunk_siz, dtype=label_dtype)
+        self.episodes = np.zeros(chunk_siz, dtype=episode_dtype)
+        if not os.path.isdir(data_dir):
+            os.makedirs(data_dir)
+        self.files = [open(os.path.join(data_dir, fil), "wb") for fil in (frames_fil, labels_fil, episodes_fil)]
+        self.write_header()
+
+    def write_header(self):
+        header = {"version": 1,
+                  "size": self.size,
+                  "frame_shape": list(self.frame_shape),
+                  "frame_dtype": self.frame_dtype.name,
+                  "frame_kind": frame_kind(self.frame_dtype),
+                  "label_dtype": np.dtype(label_dtype).name,
+                  "episode_dtype": np.dtype(episode_dtype).name}
+        tmp_fil = os.path.join(self.data_dir, header_fil + ".tmp")
+        with open(tmp_fil, "w") as f:
+            json.dump(header, f, indent=1)
+        os.replace(tmp_fil, os.path.join(self.data_dir, header_fil))
+
+    def append(self, frame, label, episode):
+        self.frames[self.fill]   = frame
+        self.labels[self.fill]   = label
+        self.episodes[self.fill] = episode
+        self.fill += 1
+        if self.fill == self.chunk_siz:
+            self.flush()
+
+    def append_chunk(self, frames, labels, episodes): # write many steps at once
+        self.flush()
+        for array, f in zip((frames, labels, episodes), self.files):
+            np.ascontiguousarray(array).tofile(f)
+            f.flush()
+        self.size += len(labels)
+        self.write_header()
+
+    def flush(self):
+        if self.fill == 0:
+            return
+        for array, f in zip((self.frames, self.labels, self.episodes), self.files):
+            array[:self.fill].tofile(f)
+            f.flush()
+        self.size += self.fill
+        self.fill = 0
+        self.write_header()
+
+    def close(self):
+        self.flush()
+        for f in self.files:
+            f.close()
+
+
+class Dataset:
+
+    # read only view of a binary dataset, the arrays are memory mapped so loading is instant
+    # and datasets larger than the RAM work
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        with open(os.path.join(data_dir, header_fil)) as f:
+            self.header = json.load(f)
+        self.size = self.header["size"]
+        self.frame_shape = tuple(self.header["frame_shape"])
+        self.frame_kind  = self.header["frame_kind"]
+        self.frames   = self.load(frames_fil, self.header["frame_dtype"], self.frame_shape)
+        self.labels   = self.load(labels_fil, self.header["label_dtype"])
+        self.episodes = self.load(episodes_fil, self.header["episode_dtype"])
+
+    def load(self, fil, dtype, shape=()):
+        if self.size == 0:
+            return np.zeros((0,) + shape, dtype=dtype)
+        return np.memmap(os.path.join(self.data_dir, fil), dtype=dtype, mode="r", shape=(self.size,) + shape)
+
+    def gray(self, ind=slice(None), dtype=np.float32): # flat grayscale frames for the steps in ind
+        frames = self.frames[ind]
+        if self.frame_kind == "rgb":
+            frames = rgb2gray(frames)
+        return np.asarray(frames, dtype=dtype).reshape(frames.shape[0], -1)
+
+
+def merge(shard_dirs, data_dir, chunk_siz=4096):
+    # concatenates binary datasets, episode ids are shifted to stay unique
+    shards = [Dataset(shard_dir) for shard_dir in shard_dirs]
+    writer = DatasetWriter(data_dir, shards[0].frame_shape, shards[0].header["frame_dtype"], chunk_siz)
+    episode_offset = 0
+    for shard in shards:
+        for start in range(0, shard.size, chunk_siz):
+            end = min(start + chunk_siz, shard.size)
+            writer.append_chunk(shard.frames[start:end], shard.labels[start:end],
+                                shard.episodes[start:end] + episode_offset)
+        if shard.size > 0:
+            episode_offset += int(shard.episodes[-1]) + 1
+    writer.close()
+    return Dataset(data_dir)
+
+def export_csv(data_dir, states_fil, labels_fil, chunk_siz=4096):
+    # writes the grayscale frames & labels in the csv format get_data.py used to write
+    dataset = Dataset(data_dir)
+    with open(states_fil, "wb") as states_f, open(labels_fil, "wb") as labels_f:
+        for start in range(0, dataset.size, chunk_siz):
+            end = min(start + chunk_siz, dataset.size)
+            np.savetxt(states_f, dataset.gray(slice(start, end), float), delimiter=',')
+            np.savetxt(labels_f, dataset.labels[start:end].astype(float), delimiter=',')
+
+def import_csv(states_fil, labels_fil, data_dir, frame_dtype="float32"):
+    # converts csv data from get_data.py into a binary dataset w/ grayscale frames,
+    # episodes start at the frames labelled w/ 0
+    assert frame_kind(frame_dtype) == "gray", "csv files only contain grayscale frames"
+    states = np.loadtxt(states_fil, delimiter=',', ndmin=2)
+    labels = np.loadtxt(labels_fil, delimiter=',', ndmin=1).astype(int)
+    episodes = np.cumsum(labels == 0) - (1 if labels.shape[0] > 0 and labels[0] == 0 else 0)
+    writer = DatasetWriter(data_dir, states.shape[1:], frame_dtype)
+    writer.append_chunk(states.astype(frame_dtype), labels.astype(label_dtype), episodes.astype(episode_dtype))
+    writer.close()
+    return Dataset(data_dir)
@@ -0,0 +1,120 @@
+import numpy as np
+# custom modules
+from utils     import rgb2gray, BatchFrameHistory
+from simulator import VecSimulator
+from oracle    import DistanceOracle
+
+# batched evaluation: num_env episodes run side by side in a VecSimulator, so the agent
+# sees the stacked states of all of them at once & gets called once per tick
+
+def sample_episodes(opt, num_episodes, seed=None):
+    # (tgt, bot) start positions of num_episodes episodes, the same ones for the same seed
+    # (the tgt is opt.tgt_y, opt.tgt_x unless they are None, like in Simulator.newGame)
+    # NOTE: bots that would start on their tgt are drawn again, those episodes would be solved w/o any step
+    rng = np.random.RandomState(seed)
+    fre_pos = VecSimulator(opt.map_ind, opt.cub_siz, opt.pob_siz, opt.act_num, 1).fre_pos
+    if opt.tgt_y is not None and opt.tgt_x is not None:
+        tgt_pos = np.tile([opt.tgt_y, opt.tgt_x], (num_episodes, 1))
+    else:
+        tgt_pos = fre_pos[rng.randint(fre_pos.shape[0], size=num_episodes)]
+    bot_pos = fre_pos[rng.randint(fre_pos.shape[0], size=num_episodes)]
+    on_tgt = np.flatnonzero(np.all(bot_pos == tgt_pos, axis=1))
+    while on_tgt.shape[0] > 0:
+        bot_pos[on_tgt] = fre_pos[rng.randint(fre_pos.shape[0], size=on_tgt.shape[0])]
+        on_tgt = on_tgt[np.all(bot_pos[on_tgt] == tgt_pos[on_tgt], axis=1)]
+    return tgt_pos, bot_pos
+
+
+class Evaluator:
+
+    # runs num_episodes episodes (at most num_env at the same time) w/ an agent given as
+    # act_fn(states) -> actions, where states are the (num_env, hist_len * state_siz) float32
+    # history stacked grayscale states (like TransitionTable.get_states / get_recent) and actions
+    # are num_env action indices (or (num_env, act_num) scores, whose argmax is taken)
+    # NOTE: w/ a seed every evaluation runs the very same episodes (independent of num_env), so
+    # NOTE: the results of different checkpoints can be compared directly
+    # NOTE: an episode ends when the tgt is reached or after early_stop steps, rows of states that
+    # NOTE: belong to no episode (once fewer than num_env are left) are zeros & their actions ignored
+
+    def __init__(self, opt, num_episodes, num_env=100, seed=None, oracle=None):
+        self.opt = opt
+        self.num_episodes = num_episodes
+        self.num_env = min(num_env, num_episodes)
+        self.seed = seed
+        self.oracle = oracle if oracle is not None else DistanceOracle(opt.oracle_mem)
+        self.vsim = VecSimulator(opt.map_ind, opt.cub_siz, opt.pob_siz, opt.act_num, self.num_env,
+                                 auto_reset=False, obs_mode=opt.obs_mode)
+        self.hist = BatchFrameHistory(self.num_env, opt.hist_len, opt.state_siz)
+
+    def get_frames(self):
+        return rgb2gray(self.vsim.state_pob).reshape(self.num_env, -1)
+
+    def opt_len(self, tgt_pos, bot_pos): # shortest path lengths from bot to tgt
+        return np.array([self.oracle.dist(self.opt.map_ind, bot[0], bot[1], tgt[0], tgt[1])
+                         for tgt, bot in zip(tgt_pos, bot_pos)], dtype=int)
+
+    def run(self, act_fn):
+        # returns a dict of per episode arrays: solved, steps (#actions taken), opt_len (#actions on
+        # a shortest path), opt_gap (steps - opt_len, -1 if not solved), collisions & ret (sum of rewards)
+        num_episodes, num_env = self.num_episodes, self.num_env
+        seed = self.seed if self.seed is not None else np.random.randint(2**31)
+        tgt_pos, bot_pos = sample_episodes(self.opt, num_episodes, seed)
+        results = {"solved":     np.zeros(num_episodes, bool),
+                   "steps":      np.zeros(num_episodes, int),
+                   "opt_len":    self.opt_len(tgt_pos, bot_pos),
+                   "collisions": np.zeros(num_episodes, int),
+                   "ret":        np.zeros(num_episodes)}
+        episode = np.arange(num_env)        # episode each env runs
+        active = np.ones(num_env, bool)     # whether it still runs one
+        next_episode = num_env
+        # start the first episodes
+        self.vsim.reset(np.arange(num_env), tgt_pos[:num_env], bot_pos[:num_env])
+        self.vsim.draw_pob()
+        self.hist.reset(self.get_frames(), fill=True)
+        while np.any(active):
+            actions = np.asarray(act_fn(self.hist.get()))
+            if actions.ndim > 1:
+                actions = np.argmax(actions, axis=1)
+            actions = np.where(active, actions, 0)
+            _, reward, terminal = self.vsim.step(actions)
+            # book keeping of the running episodes
+            env_ind = np.flatnonzero(active)
+            epi_ind = episode[env_ind]
+            results["steps"][epi_ind] += 1
+            results["collisions"][epi_ind] += reward[env_ind] == -1.
+            results["ret"][epi_ind] += reward[env_ind]
+            results["solved"][epi_ind] = terminal[env_ind]
+            done = active & (terminal | (results["steps"][episode] >= self.opt.early_stop))
+            # envs that are done start the next episodes (or stay idle)
+            done_ind = np.flatnonzero(done)
+            restart_ind = done_ind[:min(num_episodes - next_episode, done_ind.shape[0])]
+            active[done_ind[restart_ind.shape[0]:]] = False
+            if restart_ind.shape[0] > 0:
+                new_episodes = np.arange(next_episode, next_episode + restart_ind.shape[0])
+                next_episode += restart_ind.shape[0]
+                episode[restart_ind] = new_episodes
+                self.vsim.reset(restart_ind, tgt_pos[new_episodes], bot_pos[new_episodes])
+                self.vsim.draw_pob()
+            new_episode = np.zeros(num_env, bool)
+            new_episode[restart_ind] = True
+            frames = self.get_frames()
+            frames[~active] = 0
+            self.hist.push(frames, new_episode, fill=True)
+        results["opt_gap"] = np.where(results["solved"], results["steps"] - results["opt_len"], -1)
+        return results
+
+
+def summarize(results):
+    # success rate, mean #steps to the tgt, mean optimality gap (over the solved episodes) & mean #collisions
+    solved = results["solved"]
+    return {"episodes":     int(solved.shape[0]),
+            "success_rate": float(np.mean(solved)),
+            "steps_to_goal": float(np.mean(results["steps"][solved])) if np.any(solved) else float("nan"),
+            "opt_gap":      float(np.mean(results["opt_gap"][solved])) if np.any(solved) else float("nan"),
+            "collisions":   float(np.mean(results["collisions"])),
+            "ret":          float(np.mean(results["ret"]))}
+
+def print_summary(summary):
+    print("%d episodes: success rate %.3f, steps to goal %.2f, optimality gap %.2f, collisions %.2f, return %.3f"
+          % (summary["episodes"], summary["success_rate"], summary["steps_to_goal"], summary["opt_gap"],
+             summary["collisions"], summary["ret"]))
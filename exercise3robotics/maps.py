@@ -54,3 +54,78 @@ maps[1] = np.array([
     [1, 0, 0, 0, 0, 0, 0, 1, 0, 1], # 8
     [1, 1, 1, 1, 1, 1, 1, 1, 1, 1]  # 9
 ])
+
+# NOTE:
+# larger maps (e.g. for stress testing) can be generated and registered under a new index:
+#     map_ind = register_map(generate_maze(1000, 1000, seed=0, wall_siz=pob_siz // 2), min_border=pob_siz // 2)
+#     sim = Simulator(map_ind, cub_siz, pob_siz, act_num, ...)
+# generated mazes have a border wall (wall_siz cells thick, it has to be at least pob_siz // 2)
+# & all their free positions are connected, so every tgt is reachable from every bot position
+# (use random tgts, i.e. tgt_y = tgt_x = None)
+
+def generate_maze(map_hei, map_wid, seed=None, cor_siz=1, wall_siz=1, loop_prob=0.):
+    # maze w/ corridors of width cor_siz & walls of thickness wall_siz (e.g. 2 like map 0, so that
+    # a 5x5 pob won't see through walls), dug by a randomized depth first search over the grid of
+    # corridor cells, w/ loop_prob each remaining inner wall between two cells is opened as well
+    # (more loops & rooms), leftover rows / columns at the bottom / right are walls
+    rng = np.random.RandomState(seed)
+    step = cor_siz + wall_siz
+    cell_hei = (map_hei - wall_siz) // step
+    cell_wid = (map_wid - wall_siz) // step
+    assert cell_hei > 0 and cell_wid > 0, "map too small for cor_siz / wall_siz"
+    # open walls between cells: right_open[y, x]: (y, x) - (y, x + 1), down_open[y, x]: (y, x) - (y + 1, x)
+    right_open = np.zeros((cell_hei, cell_wid - 1), bool)
+    down_open  = np.zeros((cell_hei - 1, cell_wid), bool)
+    visited = np.zeros((cell_hei, cell_wid), bool)
+    start_y, start_x = rng.randint(cell_hei), rng.randint(cell_wid)
+    visited[start_y, start_x] = True
+    stack = [(start_y, start_x)]
+    while stack:
+        y, x = stack[-1]
+        nbrs = [(ny, nx) for ny, nx in ((y - 1, x), (y + 1, x), (y, x - 1), (y, x + 1))
+                if 0 <= ny < cell_hei and 0 <= nx < cell_wid and not visited[ny, nx]]
+        if not nbrs:
+            stack.pop()
+            continue
+        ny, nx = nbrs[rng.randint(len(nbrs))]
+        if ny == y:
+            right_open[y, min(x, nx)] = True
+        else:
+            down_open[min(y, ny), x] = True
+        visited[ny, nx] = True
+        stack.append((ny, nx))
+    if loop_prob > 0:
+        right_open |= rng.rand(*right_open.shape) < loop_prob
+        down_open  |= rng.rand(*down_open.shape) < loop_prob
+    # coarse grid: odd rows / cols are cells, even ones walls, then blown up to cor_siz / wall_siz
+    coarse = np.ones((2 * cell_hei + 1, 2 * cell_wid + 1), dtype=int)
+    coarse[1::2, 1::2] = 0
+    coarse[1::2, 2:-1:2] = ~right_open
+    coarse[2:-1:2, 1::2] = ~down_open
+    rep_y = np.tile([wall_siz, cor_siz], cell_hei + 1)[:-1]
+    rep_x = np.tile([wall_siz, cor_siz], cell_wid + 1)[:-1]
+    maze = np.ones((map_hei, map_wid), dtype=int)
+    maze_hei, maze_wid = int(np.sum(rep_y)), int(np.sum(rep_x))
+    maze[:maze_hei, :maze_wid] = coarse.repeat(rep_y, axis=0).repeat(rep_x, axis=1)
+    return maze
+
+def border_siz(map_arr): # thickness of the wall frame around the map
+    map_arr = np.asarray(map_arr)
+    siz = 0
+    while 2 * siz < min(map_arr.shape) and np.all(map_arr[siz, :] == 1) and np.all(map_arr[-siz-1, :] == 1) \
+            and np.all(map_arr[:, siz] == 1) and np.all(map_arr[:, -siz-1] == 1):
+        siz += 1
+    return siz
+
+def register_map(map_arr, map_ind=None, min_border=1):
+    # adds a map (0: free, 1: wall, w/ a border wall of at least min_border cells) to maps,
+    # under map_ind or the next free index
+    # NOTE: the simulators need a border of pob_siz // 2 cells, so that every pob stays inside the map
+    # NOTE: (e.g. generate_maze(..., wall_siz=2) for a 5x5 pob)
+    map_arr = np.asarray(map_arr, dtype=int)
+    assert map_arr.ndim == 2 and np.all((map_arr == 0) | (map_arr == 1)), "a map holds 0 (free) & 1 (wall)"
+    assert border_siz(map_arr) >= max(min_border, 1), "a map needs a border wall of at least %d cells" % max(min_border, 1)
+    if map_ind is None:
+        map_ind = max(maps) + 1
+    maps[map_ind] = map_arr
+    return map_ind
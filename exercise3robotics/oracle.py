@@ -0,0 +1,81 @@
+import numpy as np
+from collections import OrderedDict, deque
+# custom modules
+from maps import maps
+
+class DistanceField:
+
+    # shortest path length & an optimal action from every cell of a map to one fixed tgt,
+    # computed w/ a single (reverse) BFS from the tgt; moves are reversible so this is a plain BFS
+    # dist: #actions to reach tgt (-1 for walls & unreachable cells)
+    # act:  optimal action (lowest act_ind among the optimal ones, 0 at tgt & unreachable cells)
+
+    def __init__(self, map, tgt_y, tgt_x, act_pos_ind):
+        self.tgt_y = int(tgt_y)
+        self.tgt_x = int(tgt_x)
+        map_hei, map_wid = map.shape
+        fre_flat = (map.reshape(-1) != 1).tolist()
+        steps = [int(dy) * map_wid + int(dx) for dy, dx in act_pos_ind[1:]]
+        # 1. bfs from tgt
+        dist = [-1] * (map_hei * map_wid)
+        tgt_id = self.tgt_y * map_wid + self.tgt_x
+        dist[tgt_id] = 0
+        queue = deque([tgt_id])
+        while queue:
+            active_id = queue.popleft()
+            neighb_d = dist[active_id] + 1
+            for step in steps:
+                neighb_id = active_id + step
+                if fre_flat[neighb_id] and dist[neighb_id] == -1:
+                    dist[neighb_id] = neighb_d
+                    queue.append(neighb_id)
+        self.dist = np.array(dist, dtype=np.int32).reshape(map_hei, map_wid)
+        # 2. optimal action: the first action leading to a neighbour that is one step closer
+        self.act = np.zeros((map_hei, map_wid), dtype=np.int8)
+        ys, xs = np.nonzero(self.dist > 0)
+        found = np.zeros(ys.shape[0], bool)
+        for act_ind in range(1, len(act_pos_ind)):
+            neighb_d = self.dist[ys + act_pos_ind[act_ind][0], xs + act_pos_ind[act_ind][1]]
+            better = ~found & (neighb_d == self.dist[ys, xs] - 1)
+            self.act[ys[better], xs[better]] = act_ind
+            found |= better
+
+    @property
+    def nbytes(self):
+        return self.dist.nbytes + self.act.nbytes
+
+
+class DistanceOracle:
+
+    # LRU cache of DistanceFields keyed by (map_ind, tgt), holding at most max_bytes of fields
+
+    def __init__(self, max_bytes=64 * 2**20):
+        self.max_bytes = max_bytes
+        self.act_pos_ind = np.array([
+            [ 0,  0], # o
+            [-1,  0], # ^
+            [ 1,  0], # V
+            [ 0, -1], # <
+            [ 0,  1]  # >
+        ])
+        self.fields = OrderedDict() # (map_ind, tgt_y, tgt_x): DistanceField, least recently used first
+        self.nbytes = 0
+
+    def get(self, map_ind, tgt_y, tgt_x):
+        key = (map_ind, int(tgt_y), int(tgt_x))
+        field = self.fields.pop(key, None)
+        if field is None:
+            field = DistanceField(maps[map_ind], tgt_y, tgt_x, self.act_pos_ind)
+            self.nbytes += field.nbytes
+            # evict least recently used fields until the new one fits (it is always kept)
+            while self.fields and self.nbytes > self.max_bytes:
+                _, old_field = self.fields.popitem(last=False)
+                self.nbytes -= old_field.nbytes
+        self.fields[key] = field
+        return field
+
+    def dist(self, map_ind, bot_y, bot_x, tgt_y, tgt_x): # optimal path length from bot to tgt
+        return int(self.get(map_ind, tgt_y, tgt_x).dist[bot_y, bot_x])
+
+    def act(self, map_ind, bot_y, bot_x, tgt_y, tgt_x): # optimal action for bot
+        return int(self.get(map_ind, tgt_y, tgt_x).act[bot_y, bot_x])
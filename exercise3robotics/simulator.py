@@ -1,17 +1,22 @@
 import numpy as np
-from random import randrange
+from heapq import heappush, heappop
+from random import Random
 # custom modules
-from utils import State
-from maps import maps
+from utils import State, upsample_grid
+from maps import maps, border_siz
 
 class Simulator:
 
     # basic funcs
 
-    def __init__(self, map_ind, cub_siz, pob_siz, act_num):
+    def __init__(self, map_ind, cub_siz, pob_siz, act_num, oracle=None, obs_mode="pixel", seed=None):
         self.map_ind = map_ind
         self.cub_siz = cub_siz
+        self.obs_mode = obs_mode # "pixel": cub_siz x cub_siz pixels per cell; "grid": 1 pixel per cell
+        self.drw_siz = 1 if obs_mode == "grid" else cub_siz # size of the cubes that are actually drawn
+        self.rng = Random(seed) # own random stream for choosing bot & tgt positions
         self.pob_siz = pob_siz
+        self.oracle  = oracle # DistanceOracle: when given, expert actions are looked up instead of planned w/ A*
         self.bot_ind = 0 # bot's index in obj_pos
         self.tgt_ind = 1 # bot's index in obj_pos
         self.obs_ind = 2 # bot's index in obj_pos
@@ -39,6 +44,7 @@ class Simulator:
 
     def reset_map(self, map_ind):
         self.map     = maps[self.map_ind]
+        assert border_siz(self.map) >= self.pob_siz // 2, "map %s needs a border wall of at least pob_siz // 2 = %d cells" % (self.map_ind, self.pob_siz // 2)
         self.map_hei = self.map.shape[0]
         self.map_wid = self.map.shape[1]
         self.bot_pos_old = np.array([self.map_hei, self.map_wid], int)
@@ -52,109 +58,115 @@ class Simulator:
         self.obj_pos[self.bot_ind][1] = self.map_wid # to ease drawing
         self.obj_pos[self.tgt_ind][0] = self.map_hei # to ease drawing
         self.obj_pos[self.tgt_ind][1] = self.map_wid # to ease drawing
-        obj_ind = self.obs_ind
-        fre_ind = 0
-        for y in range(self.map_hei):
-            for x in range(self.map_wid):
-                if self.map[y][x] == 1:
-                    self.obj_pos[obj_ind][0] = y
-                    self.obj_pos[obj_ind][1] = x
-                    obj_ind += 1
-                else:
-                    self.fre_pos[fre_ind][0] = y
-                    self.fre_pos[fre_ind][1] = x
-                    fre_ind += 1
+        # obs & free positions in row major order
+        self.obj_pos[self.obs_ind:] = np.argwhere(self.map == 1)
+        self.fre_pos[:] = np.argwhere(self.map != 1)
+        self.reset_nbr()
         self.reset_state()
         self.draw_reset()
 
+    def reset_nbr(self): # free neighbours of each cell as [(act_ind, cell id)], cell id = y * map_wid + x
+        # NOTE: only free inner cells get neighbours, A* never expands a wall cell
+        cell_id = np.arange(self.map_hei * self.map_wid).reshape(self.map_hei, self.map_wid)
+        inner = np.zeros((self.map_hei, self.map_wid), bool)
+        inner[1:-1, 1:-1] = self.map[1:-1, 1:-1] != 1
+        inner_id = cell_id[inner]
+        act_ind = np.arange(1, self.act_num) # act 0 never moves the bot
+        neighb_id = inner_id[:, None] + (self.act_pos_ind[act_ind, 0] * self.map_wid + self.act_pos_ind[act_ind, 1])
+        neighb_fre = self.map.reshape(-1)[neighb_id] != 1
+        self.nbr_lst = [[] for _ in range(self.map_hei * self.map_wid)]
+        act_lst = act_ind.tolist()
+        for cell, neighb, fre in zip(inner_id.tolist(), neighb_id.tolist(), neighb_fre.tolist()):
+            self.nbr_lst[cell] = [(a, n) for a, n, f in zip(act_lst, neighb, fre) if f]
+
     def reset_state(self):
         self.state_action   = 0
         self.state_reward   = 0.
-        self.state_screen   = np.zeros((self.map_hei*self.cub_siz, self.map_wid*self.cub_siz, 3), dtype=np.uint8)
+        self.state_screen   = np.zeros((self.map_hei*self.drw_siz, self.map_wid*self.drw_siz, 3), dtype=np.uint8)
         self.state_terminal = False
-        self.state_pob      = np.zeros((self.pob_siz*self.cub_siz, self.pob_siz*self.cub_siz, 3), dtype=np.uint8)
+        self.state_pob      = np.zeros((self.pob_siz*self.drw_siz, self.pob_siz*self.drw_siz, 3), dtype=np.uint8)
+        self.epi_step       = 0 # #steps since newGame
+        self.astar_act_lst  = []
+        self.astar_terminal = False
+        self.dist_field     = None
 
     # helper funcs
 
     def get_cube_from_ind(self, y, x):
-        return self.cub_siz*y, self.cub_siz*(y+1), self.cub_siz*x, self.cub_siz*(x+1)
+        return self.drw_siz*y, self.drw_siz*(y+1), self.drw_siz*x, self.drw_siz*(x+1)
 
     def get_pob_from_ind(self, y, x):
         pob_edg = self.pob_siz // 2
-        return self.cub_siz*(y-pob_edg), self.cub_siz*(y+pob_edg+1), self.cub_siz*(x-pob_edg), self.cub_siz*(x+pob_edg+1)
+        return self.drw_siz*(y-pob_edg), self.drw_siz*(y+pob_edg+1), self.drw_siz*(x-pob_edg), self.drw_siz*(x+pob_edg+1)
 
     def get_h_val(self, active_pose, tgt_y, tgt_x):
         return np.abs(active_pose[0] - tgt_y) + np.abs(active_pose[1] - tgt_x)
 
     def astar(self, bot_y, bot_x, tgt_y, tgt_x):
+        # NOTE: open_list is a heap of (fVal, open_order, cell id) where open_order counts first insertions,
+        # NOTE: so nodes are expanded (and ties broken) exactly like a linear scan for the min fVal
+        # NOTE: over an insertion ordered dict would do
         # 0. setting up
         self.astar_terminal = False
-        open_count = 0
-        open_list = {} # (y, x): fVal
-        clsd_list = {} # (y, x): fVal
-        gVal_list = {} # (y, x): gVal
-        hVal_list = {} # (y, x): hVal
-        came_from = {} # (neighb_y, neighb_x): ((active_y, active_x), act_ind)
+        map_wid = self.map_wid
+        tgt_y, tgt_x = int(tgt_y), int(tgt_x)
+        bot_id = int(bot_y) * map_wid + int(bot_x)
+        tgt_id = tgt_y * map_wid + tgt_x
+        nbr_lst = self.nbr_lst
+        open_list = [] # heap of (fVal, open_order, id)
+        open_fVal = {} # id: fVal, only for entries that are still open
+        open_ordr = {} # id: open_order
+        clsd_list = set()
+        gVal_list = {} # id: gVal
+        came_from = {} # neighb_id: (active_id, act_ind)
 
         # 1. push start node into open_list
-        active_pose = (bot_y, bot_x)
-        gVal_list[active_pose] = 0
-        hVal_list[active_pose] = self.get_h_val(active_pose, tgt_y, tgt_x)
-        open_list[active_pose] = gVal_list[active_pose] + hVal_list[active_pose]
-        open_count += 1
+        if bot_id == tgt_id: # already at tgt, the first (no-op) action reaches it
+            self.astar_terminal = True
+            self.astar_act_lst = []
+            return True
+        gVal_list[bot_id] = 0
+        open_fVal[bot_id] = abs(int(bot_y) - tgt_y) + abs(int(bot_x) - tgt_x)
+        open_ordr[bot_id] = 0
+        heappush(open_list, (open_fVal[bot_id], 0, bot_id))
 
         # 2. expand using A*
-        while open_count > 0:
-            # 0. sort open_list to pop the entry w/ min f score
-            min_fVal = None
-            for k, v in open_list.items():
-                if min_fVal is None or v < min_fVal:
-                    min_pose  = k
-                    min_fVal = v
-            active_pose = min_pose
-            clsd_list[active_pose] = open_list[active_pose] # add it in  clsd_list
-            open_list.pop(active_pose, "None")              # pop it out open_list
-            open_count -= 1
+        while open_list:
+            # 0. pop the entry w/ min f score, skipping entries that were closed or re-pushed w/ a lower f score
+            active_fVal, _, active_id = heappop(open_list)
+            if open_fVal.get(active_id) != active_fVal:
+                continue
+            del open_fVal[active_id]
+            clsd_list.add(active_id)
+            neighb_g = gVal_list[active_id] + 1
             # 1. iterate through all its possible successors
-            for act_ind in range(self.act_num):
-                neighb_pose = self.astar_act(active_pose[0], active_pose[1], tgt_y, tgt_x, act_ind)
-                if self.astar_terminal: # have reached tgt, stop searching
-                    came_from[neighb_pose] = (active_pose, act_ind)
-                    self.astar_retrieve_actions(came_from, bot_y, bot_x, tgt_y, tgt_x)
+            for act_ind, neighb_id in nbr_lst[active_id]:
+                if neighb_id == tgt_id: # have reached tgt, stop searching
+                    came_from[neighb_id] = (active_id, act_ind)
+                    self.astar_terminal = True
+                    self.astar_retrieve_actions(came_from, bot_id, tgt_id)
                     return True
-                else:
-                    if neighb_pose != active_pose:      # if have actually moved
-                        if not neighb_pose in clsd_list:  # if not in clsd_list
-                            neighb_g = gVal_list[active_pose] + 1
-                            neighb_h = self.get_h_val(neighb_pose, tgt_y, tgt_x)
-                            neighb_f = neighb_g + neighb_h
-                            if not neighb_pose in open_list or open_list[neighb_pose] >= neighb_f:
-                                if not neighb_pose in open_list:
-                                    open_count += 1
-                                open_list[neighb_pose] = neighb_f
-                                gVal_list[neighb_pose] = neighb_g
-                                hVal_list[neighb_pose] = neighb_h
-                                came_from[neighb_pose] = (active_pose, act_ind)
+                if neighb_id in clsd_list:
+                    continue
+                neighb_y, neighb_x = divmod(neighb_id, map_wid)
+                neighb_f = neighb_g + abs(neighb_y - tgt_y) + abs(neighb_x - tgt_x)
+                old_f = open_fVal.get(neighb_id)
+                if old_f is None or old_f >= neighb_f:
+                    if old_f is None:
+                        open_ordr[neighb_id] = len(open_ordr)
+                    if old_f is None or neighb_f < old_f:
+                        heappush(open_list, (neighb_f, open_ordr[neighb_id], neighb_id))
+                    open_fVal[neighb_id] = neighb_f
+                    gVal_list[neighb_id] = neighb_g
+                    came_from[neighb_id] = (active_id, act_ind)
         return False
 
-    def astar_act(self, bot_y, bot_x, tgt_y, tgt_x, act_ind):
-        bot_pos_new = np.ndarray(self.state_dim, int)
-        bot_pos_new[0] = bot_y + self.act_pos_ind[act_ind][0]
-        bot_pos_new[1] = bot_x + self.act_pos_ind[act_ind][1]
-        if bot_pos_new[0] == tgt_y and bot_pos_new[1] == tgt_x: # reaching tgt
-            self.astar_terminal = True
-            return (bot_pos_new[0], bot_pos_new[1])
-        elif self.map[bot_pos_new[0]][bot_pos_new[1]] == 1: # collision
-            return (bot_y, bot_x)
-        else:
-            return (bot_pos_new[0], bot_pos_new[1])
-
-    def astar_retrieve_actions(self, came_from, bot_y, bot_x, tgt_y, tgt_x):
+    def astar_retrieve_actions(self, came_from, bot_id, tgt_id):
         self.astar_act_lst = []
-        tmp_pose = (tgt_y, tgt_x)
-        while tmp_pose != (bot_y, bot_x):
-            self.astar_act_lst.append(came_from[tmp_pose][1])
-            tmp_pose = came_from[tmp_pose][0]
+        tmp_id = tgt_id
+        while tmp_id != bot_id:
+            self.astar_act_lst.append(came_from[tmp_id][1])
+            tmp_id = came_from[tmp_id][0]
 
     def act(self):
         bot_pos_new = self.obj_pos[self.bot_ind, :] + self.act_pos_ind[self.state_action, :]
@@ -184,11 +196,9 @@ class Simulator:
         self.state_screen[y1:y2, x1:x2, clr_ind] = clr_val
 
     def draw_reset(self): # reset background & draw obs
-        self.state_screen = np.zeros((self.map_hei*self.cub_siz, self.map_wid*self.cub_siz, 3), dtype=np.uint8)
-        for obj_ind in range(self.obs_ind, self.obj_num):
-            self.draw_cube(self.obj_pos[obj_ind][0],
-                           self.obj_pos[obj_ind][1],
-                           self.obs_clr_ind, 255)
+        self.state_screen = np.zeros((self.map_hei*self.drw_siz, self.map_wid*self.drw_siz, 3), dtype=np.uint8)
+        # all obs cubes at once
+        self.state_screen[..., self.obs_clr_ind] = (self.map == 1).repeat(self.drw_siz, axis=0).repeat(self.drw_siz, axis=1) * 255
 
     def draw_new(self): # erase old bot tgt & draw new tgt
         # black old bot
@@ -222,7 +232,7 @@ class Simulator:
 
     # interfacing funcs
 
-    def newGame(self, tgt_y, tgt_x):
+    def newGame(self, tgt_y, tgt_x, bot_y=None, bot_x=None):
         # 0. setting up
         if self.obj_pos[self.bot_ind][0] != -1 and self.obj_pos[self.bot_ind][1] != -1:
             self.bot_pos_old[0] = self.obj_pos[self.bot_ind][0]
@@ -235,26 +245,43 @@ class Simulator:
             self.obj_pos[self.tgt_ind][0] = tgt_y
             self.obj_pos[self.tgt_ind][1] = tgt_x
         else:
-            choose_tgt_ind = randrange(self.fre_pos.shape[0])
+            choose_tgt_ind = self.rng.randrange(self.fre_pos.shape[0])
             self.obj_pos[self.tgt_ind][0] = self.fre_pos[choose_tgt_ind][0]
             self.obj_pos[self.tgt_ind][1] = self.fre_pos[choose_tgt_ind][1]
         # 2. assign bot position
-        choose_bot_ind = randrange(self.fre_pos.shape[0])
-        self.obj_pos[self.bot_ind][0] = self.fre_pos[choose_bot_ind][0]
-        self.obj_pos[self.bot_ind][1] = self.fre_pos[choose_bot_ind][1]
-        # 3. generate A* actions for this current episode
-        self.astar(self.obj_pos[self.bot_ind][0],
-                   self.obj_pos[self.bot_ind][1],
-                   self.obj_pos[self.tgt_ind][0],
-                   self.obj_pos[self.tgt_ind][1])
+        if bot_y != None and bot_x != None:
+            self.obj_pos[self.bot_ind][0] = bot_y
+            self.obj_pos[self.bot_ind][1] = bot_x
+        else:
+            choose_bot_ind = self.rng.randrange(self.fre_pos.shape[0])
+            self.obj_pos[self.bot_ind][0] = self.fre_pos[choose_bot_ind][0]
+            self.obj_pos[self.bot_ind][1] = self.fre_pos[choose_bot_ind][1]
+        # 3. generate A* actions for this current episode (or get the distance field for this tgt)
+        if self.oracle is None:
+            self.astar(self.obj_pos[self.bot_ind][0],
+                       self.obj_pos[self.bot_ind][1],
+                       self.obj_pos[self.tgt_ind][0],
+                       self.obj_pos[self.tgt_ind][1])
+        else:
+            self.dist_field = self.oracle.get(self.map_ind,
+                                              self.obj_pos[self.tgt_ind][0],
+                                              self.obj_pos[self.tgt_ind][1])
         # 4. wrap up
         self.draw_new()
         self.tgt_pos_old[0] = self.obj_pos[self.tgt_ind][0]
         self.tgt_pos_old[1] = self.obj_pos[self.tgt_ind][1]
-        return self.step(0)
+        state = self.step(0)
+        self.epi_step = 0 # the newGame step does not count
+        return state
+
+    def get_opt_len(self): # #actions on a shortest path from the current bot position to tgt
+        assert self.oracle is not None
+        return int(self.dist_field.dist[self.obj_pos[self.bot_ind][0], self.obj_pos[self.bot_ind][1]])
 
     def step(self, action=None):
-        if action is None: # NOTE: when no action is given, will take the A* action
+        if action is None and self.oracle is not None: # NOTE: optimal action from the distance field
+            self.state_action = int(self.dist_field.act[self.obj_pos[self.bot_ind][0], self.obj_pos[self.bot_ind][1]])
+        elif action is None: # NOTE: when no action is given, will take the A* action
             assert len(self.astar_act_lst) > 0
             self.state_action = self.astar_act_lst.pop()
         else:
@@ -266,4 +293,169 @@ class Simulator:
         self.act()
         self.draw_step()
         self.draw_pob()
+        self.epi_step += 1
+        return self.get_state()
+
+    def snapshot(self, rng=True):
+        # the minimal state (once a game was started) to branch off from w/ restore(), e.g. for lookahead / tree search
+        # (positions, last step's results, #steps, expert actions & w/ rng the random stream of newGame)
+        # NOTE: the screen is not copied, restore() redraws the few cubes that differ
+        return (int(self.obj_pos[self.bot_ind][0]), int(self.obj_pos[self.bot_ind][1]),
+                int(self.obj_pos[self.tgt_ind][0]), int(self.obj_pos[self.tgt_ind][1]),
+                int(self.bot_pos_old[0]), int(self.bot_pos_old[1]),
+                int(self.tgt_pos_old[0]), int(self.tgt_pos_old[1]),
+                self.state_action, self.state_reward, self.state_terminal, self.epi_step,
+                list(self.astar_act_lst), self.astar_terminal, self.dist_field,
+                self.rng.getstate() if rng else None)
+
+    def restore(self, snap): # back to the state of snapshot(), returns it like step()
+        (bot_y, bot_x, tgt_y, tgt_x, bot_old_y, bot_old_x, tgt_old_y, tgt_old_x,
+         self.state_action, self.state_reward, self.state_terminal, self.epi_step,
+         astar_act_lst, self.astar_terminal, self.dist_field, rng_state) = snap
+        # the screen only differs in the bot & tgt cubes
+        self.draw_cube(self.obj_pos[self.bot_ind][0], self.obj_pos[self.bot_ind][1], self.bot_clr_ind, 0)
+        self.draw_cube(self.obj_pos[self.tgt_ind][0], self.obj_pos[self.tgt_ind][1], self.tgt_clr_ind, 0)
+        self.obj_pos[self.bot_ind] = bot_y, bot_x
+        self.obj_pos[self.tgt_ind] = tgt_y, tgt_x
+        self.draw_cube(tgt_y, tgt_x, self.tgt_clr_ind, 255)
+        self.draw_cube(bot_y, bot_x, self.bot_clr_ind, 255)
+        self.bot_pos_old[:] = bot_old_y, bot_old_x
+        self.tgt_pos_old[:] = tgt_old_y, tgt_old_x
+        self.astar_act_lst = list(astar_act_lst) # the snapshot stays valid for further restores
+        if rng_state is not None:
+            self.rng.setstate(rng_state)
+        self.draw_pob()
+        return self.get_state()
+
+
+class VecSimulator:
+
+    # steps num_env bots/tgts on the same map at once, all state is kept in arrays
+    # NOTE: each env follows the same loop as get_data.py / test_agent.py, i.e.
+    # NOTE: if the env is done (terminal or early_stop reached) the next call to
+    # NOTE: step() starts a new game for it (its action is ignored), otherwise the action is taken
+
+    # basic funcs
+
+    def __init__(self, map_ind, cub_siz, pob_siz, act_num, num_env, early_stop=None, auto_reset=True, obs_mode="pixel", seed=None):
+        self.map_ind = map_ind
+        self.cub_siz = cub_siz
+        self.obs_mode = obs_mode
+        self.drw_siz = 1 if obs_mode == "grid" else cub_siz
+        self.pob_siz = pob_siz
+        self.act_num = act_num
+        self.num_env = num_env
+        self.early_stop = early_stop
+        self.auto_reset = auto_reset
+        self.rng = np.random.RandomState(seed) # own random stream for choosing bot & tgt positions
+        self.bot_clr_ind = 2 # blue
+        self.tgt_clr_ind = 1 # green
+        self.obs_clr_ind = 0 # red
+        self.act_pos_ind = np.array([
+            [ 0,  0], # o
+            [-1,  0], # ^
+            [ 1,  0], # V
+            [ 0, -1], # <
+            [ 0,  1]  # >
+        ])
+        self.reset_map(self.map_ind)
+
+    # reset funcs
+
+    def reset_map(self, map_ind):
+        self.map     = maps[self.map_ind]
+        assert border_siz(self.map) >= self.pob_siz // 2, "map %s needs a border wall of at least pob_siz // 2 = %d cells" % (self.map_ind, self.pob_siz // 2)
+        self.map_hei = self.map.shape[0]
+        self.map_wid = self.map.shape[1]
+        self.fre_pos = np.argwhere(self.map == 0) # same (row major) order as Simulator.fre_pos
+        pob_edg = self.pob_siz // 2
+        self.pob_off = np.arange(-pob_edg, pob_edg + 1)
+        self.tgt_y = None
+        self.tgt_x = None
+        self.reset_state()
+
+    def reset_state(self):
+        self.bot_pos        = np.zeros((self.num_env, 2), int)
+        self.tgt_pos        = np.zeros((self.num_env, 2), int)
+        self.epi_step       = np.zeros(self.num_env, int) # #actions taken in current episode
+        self.state_action   = np.zeros(self.num_env, int)
+        self.state_reward   = np.zeros(self.num_env)
+        self.state_terminal = np.zeros(self.num_env, bool)
+        self.state_pob      = np.zeros((self.num_env, self.pob_siz*self.drw_siz, self.pob_siz*self.drw_siz, 3), dtype=np.uint8)
+
+    # helper funcs
+
+    def get_done(self):
+        done = self.state_terminal.copy()
+        if self.early_stop is not None:
+            done |= self.epi_step >= self.early_stop
+        return done
+
+    def act(self, env_ind, actions): # same rules as Simulator.act for the envs in env_ind
+        bot_pos_new = self.bot_pos[env_ind] + self.act_pos_ind[actions]
+        reach = np.all(bot_pos_new == self.tgt_pos[env_ind], axis=1)                    # reaching tgt
+        clsn  = ~reach & (self.map[bot_pos_new[:, 0], bot_pos_new[:, 1]] == 1)           # collision
+        self.state_action[env_ind]   = actions
+        self.state_reward[env_ind]   = np.where(reach, 1., np.where(clsn, -1., -0.04))
+        self.state_terminal[env_ind] = reach
+        move_ind = env_ind[~clsn]
+        self.bot_pos[move_ind] = bot_pos_new[~clsn]
+
+    def reset(self, env_ind, tgt_pos=None, bot_pos=None):
+        # same as Simulator.newGame for the envs in env_ind (w/ the given (num, 2) positions if any)
+        num = env_ind.shape[0]
+        if tgt_pos is not None:
+            self.tgt_pos[env_ind] = tgt_pos
+        elif self.tgt_y != None and self.tgt_x != None:
+            self.tgt_pos[env_ind, 0] = self.tgt_y
+            self.tgt_pos[env_ind, 1] = self.tgt_x
+        else:
+            self.tgt_pos[env_ind] = self.fre_pos[self.rng.randint(self.fre_pos.shape[0], size=num)]
+        if bot_pos is not None:
+            self.bot_pos[env_ind] = bot_pos
+        else:
+            self.bot_pos[env_ind] = self.fre_pos[self.rng.randint(self.fre_pos.shape[0], size=num)]
+        self.epi_step[env_ind] = 0
+        self.act(env_ind, np.zeros(num, int)) # newGame returns step(0)
+
+    def get_state(self):
+        return self.state_pob, self.state_reward.copy(), self.state_terminal.copy()
+
+    # drawing funcs
+
+    def draw_pob(self): # render all pobs directly from map & positions, identical to Simulator.draw_pob for the same obs_mode
+        pob_y = self.bot_pos[:, 0, None] + self.pob_off # (num_env, pob_siz)
+        pob_x = self.bot_pos[:, 1, None] + self.pob_off
+        pob_grid = np.zeros((self.num_env, self.pob_siz, self.pob_siz, 3), dtype=np.uint8)
+        pob_grid[..., self.obs_clr_ind] = self.map[pob_y[:, :, None], pob_x[:, None, :]] * 255
+        pob_grid[..., self.tgt_clr_ind] = ((pob_y[:, :, None] == self.tgt_pos[:, 0, None, None]) &
+                                           (pob_x[:, None, :] == self.tgt_pos[:, 1, None, None])) * 255
+        pob_grid[:, self.pob_siz // 2, self.pob_siz // 2, self.bot_clr_ind] = 255
+        if self.obs_mode == "grid":
+            self.state_pob = pob_grid
+        else:
+            self.state_pob = upsample_grid(pob_grid, self.cub_siz)
+
+    # interfacing funcs
+
+    def newGame(self, tgt_y, tgt_x): # start a new game in every env
+        self.tgt_y = tgt_y
+        self.tgt_x = tgt_x
+        self.reset(np.arange(self.num_env))
+        self.draw_pob()
+        return self.get_state()
+
+    def step(self, actions):
+        actions = np.asarray(actions, int).reshape(self.num_env)
+        if self.auto_reset:
+            done = self.get_done()
+        else:
+            done = np.zeros(self.num_env, bool)
+        reset_ind = np.flatnonzero(done)
+        step_ind  = np.flatnonzero(~done)
+        if reset_ind.shape[0] > 0:
+            self.reset(reset_ind)
+        self.act(step_ind, actions[step_ind])
+        self.epi_step[step_ind] += 1
+        self.draw_pob()
         return self.get_state()
@@ -1,15 +1,15 @@
 import numpy as np
-import matplotlib
-matplotlib.use('TkAgg')
-import matplotlib.pyplot as plt
-from random import randrange
 # custom modules
-from utils     import Options, rgb2gray
-from simulator import Simulator
+from utils     import Options
+from oracle    import DistanceOracle
+from evaluate  import Evaluator, summarize, print_summary
 
 # 0. initialization
 opt = Options()
-sim = Simulator(opt.map_ind, opt.cub_siz, opt.pob_siz, opt.act_num)
+# runs opt.eval_nepisodes episodes, opt.eval_num_env of them at the same time, the oracle gives
+# the shortest path length of each episode for free (for the optimality gap)
+# NOTE: w/ a fixed opt.eval_seed every run evaluates the very same episodes
+evaluator = Evaluator(opt, opt.eval_nepisodes, opt.eval_num_env, opt.eval_seed, DistanceOracle(opt.oracle_mem))
 
 # TODO: load your agent
 # Hint: If using standard tensorflow api it helps to write your own model.py  
@@ -19,60 +19,19 @@ sim = Simulator(opt.map_ind, opt.cub_siz, opt.pob_siz, opt.act_num)
 agent =None
 
 # 1. control loop
-if opt.disp_on:
-    win_all = None
-    win_pob = None
-epi_step = 0    # #steps in current episode
-nepisodes = 0   # total #episodes executed
-nepisodes_solved = 0
-action = 0     # action to take given by the network
-
-# start a new game
-state = sim.newGame(opt.tgt_y, opt.tgt_x)
-for step in range(opt.eval_steps):
-
-    # check if episode ended
-    if state.terminal or epi_step >= opt.early_stop:
-        epi_step = 0
-        nepisodes += 1
-        if state.terminal:
-            nepisodes_solved += 1
-        # start a new game
-        state = sim.newGame(opt.tgt_y, opt.tgt_x)
-    else:
-        #!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
-        # TODO: here you would let your agent take its action
-        #!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
-        # Hint: get the image using rgb2gray(state.pob), append latest image to a history 
-        # this just gets a random action
-        action = randrange(opt.act_num)
-        state = sim.step(action)
-
-        epi_step += 1
-
-    if state.terminal or epi_step >= opt.early_stop:
-        epi_step = 0
-        nepisodes += 1
-        if state.terminal:
-            nepisodes_solved += 1
-        # start a new game
-        state = sim.newGame(opt.tgt_y, opt.tgt_x)
-
-    if step % opt.prog_freq == 0:
-        print(step)
-
-    if opt.disp_on:
-        if win_all is None:
-            plt.subplot(121)
-            win_all = plt.imshow(state.screen)
-            plt.subplot(122)
-            win_pob = plt.imshow(state.pob)
-        else:
-            win_all.set_data(state.screen)
-            win_pob.set_data(state.pob)
-        plt.pause(opt.disp_interval)
-        plt.draw()
+def act_fn(states):
+    #!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
+    # TODO: here you would let your agent take its actions
+    #!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
+    # Hint: states holds the history stacked grayscale states of all running episodes,
+    # one per row (like trans.get_recent()), so one forward pass gives all actions
+    # (returning the network output (num_env x act_num) is fine as well, its argmax is taken)
+    # this just gets random actions
+    return np.random.randint(opt.act_num, size=states.shape[0])
+
+results = evaluator.run(act_fn)
 
 # 2. calculate statistics
-print(float(nepisodes_solved) / float(nepisodes))
+print_summary(summarize(results))
 # 3. TODO perhaps  do some additional analysis
+# results holds per episode arrays: solved, steps, opt_len, opt_gap, collisions & ret
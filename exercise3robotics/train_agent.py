@@ -5,6 +5,7 @@ import tensorflow as tf
 from utils     import Options
 from simulator import Simulator
 from transitionTable import TransitionTable
+from trajlog   import TrajectoryLog, TrajectoryRenderer
 
 #!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
 # NOTE:
@@ -15,10 +16,14 @@ from transitionTable import TransitionTable
 
 # 0. initialization
 opt = Options()
-sim = Simulator(opt.map_ind, opt.cub_siz, opt.pob_siz, opt.act_num)
+if opt.data_fmt == "traj": # render the logged trajectories w/ the current cub_siz & pob_siz first
+    TrajectoryRenderer(TrajectoryLog(opt.traj_fil), opt.cub_siz, opt.pob_siz, opt.act_num, opt.obs_mode).to_dataset(opt.data_dir)
+sim = Simulator(opt.map_ind, opt.cub_siz, opt.pob_siz, opt.act_num, obs_mode=opt.obs_mode)
 trans = TransitionTable(opt.state_siz, opt.act_num, opt.hist_len,
                              opt.minibatch_size, opt.valid_size,
-                             opt.states_fil, opt.labels_fil)
+                             opt.states_fil, opt.labels_fil,
+                             opt.data_dir if opt.data_fmt != "csv" else None,
+                             opt.store_dtype)
 
 # 1. train
 ######################################
@@ -33,6 +38,12 @@ trans = TransitionTable(opt.state_siz, opt.act_num, opt.hist_len,
 #
 # for i in range(number_of_batches):
 #     x, y = trans.sample_minibatch()
+#
+# or let a background thread build the mini batches while you train
+# (the arrays are reused, so use them before asking for the next batch)
+#
+# for x, y in trans.iterate_minibatches(num_epochs=10):
+#     ...
 # Hint: to ease loading your model later create a model.py file
 # where you define your network configuration
 ######################################
@@ -0,0 +1,127 @@
+import numpy as np
+# custom modules
+from utils     import rgb2gray
+from simulator import Simulator
+from oracle    import DistanceOracle
+from dataset   import DatasetWriter, label_dtype
+
+# trajectory logs: an episode is fully described by its map, tgt, start cell & actions,
+# so instead of the rendered frames we only store (in one .npz file)
+#   episodes: int32 (#episodes, 8): map_ind, tgt_y, tgt_x, bot_y, bot_x, act_start, act_len, skip
+#   actions:  uint8 actions of all episodes, episode i owns actions[act_start:act_start+act_len]
+# the frames of an episode are the newGame frame (label 0) followed by one frame per action,
+# the first skip frames of an episode were not part of the collected data (see datagen.collect_shard)
+
+epi_cols = 8
+
+class TrajectoryWriter:
+
+    def __init__(self, traj_fil):
+        self.traj_fil = traj_fil
+        self.episodes = []
+        self.actions  = []
+
+    def new_episode(self, map_ind, tgt_y, tgt_x, bot_y, bot_x, skip=0):
+        self.episodes.append([map_ind, tgt_y, tgt_x, bot_y, bot_x, len(self.actions), 0, skip])
+
+    def append(self, action):
+        self.actions.append(action)
+        self.episodes[-1][6] += 1
+
+    def close(self):
+        np.savez(self.traj_fil,
+                 episodes=np.array(self.episodes, dtype=np.int32).reshape(-1, epi_cols),
+                 actions=np.array(self.actions, dtype=np.uint8))
+
+
+class TrajectoryLog:
+
+    def __init__(self, traj_fil):
+        log = np.load(traj_fil)
+        self.episodes = log["episodes"]
+        self.actions  = log["actions"]
+        self.num_epi  = self.episodes.shape[0]
+        # #frames each episode contributes to the dataset
+        self.epi_len  = self.episodes[:, 6] + 1 - self.episodes[:, 7]
+        self.size     = int(np.sum(self.epi_len))
+
+    def get_actions(self, epi_ind):
+        act_start, act_len = self.episodes[epi_ind, 5], self.episodes[epi_ind, 6]
+        return self.actions[act_start:act_start+act_len]
+
+
+def merge_logs(traj_fils, traj_fil): # concatenates trajectory logs
+    logs = [TrajectoryLog(fil) for fil in traj_fils]
+    episodes, act_offset = [], 0
+    for log in logs:
+        shard_episodes = log.episodes.copy()
+        shard_episodes[:, 5] += act_offset
+        episodes.append(shard_episodes)
+        act_offset += log.actions.shape[0]
+    np.savez(traj_fil,
+             episodes=np.concatenate(episodes).reshape(-1, epi_cols),
+             actions=np.concatenate([log.actions for log in logs]))
+
+
+class TrajectoryRenderer:
+
+    # replays logged episodes w/ a Simulator to rebuild their states & labels,
+    # w/ any cub_siz / pob_siz / obs_mode (not necessarily the ones used for collecting)
+
+    def __init__(self, log, cub_siz, pob_siz, act_num=5, obs_mode="pixel"):
+        self.log = log
+        self.cub_siz = cub_siz
+        self.pob_siz = pob_siz
+        self.act_num = act_num
+        self.obs_mode = obs_mode
+        self.oracle = DistanceOracle() # so that newGame does not need to run A*
+        self.sims = {} # map_ind: Simulator
+
+    def get_sim(self, map_ind):
+        if map_ind not in self.sims:
+            self.sims[map_ind] = Simulator(map_ind, self.cub_siz, self.pob_siz, self.act_num,
+                                           self.oracle, self.obs_mode)
+        return self.sims[map_ind]
+
+    def render_episode(self, epi_ind, skip=True):
+        # states (flat grayscale frames) & labels of an episode, the same as get_data.py collected them
+        map_ind, tgt_y, tgt_x, bot_y, bot_x, _, _, epi_skip = self.log.episodes[epi_ind]
+        sim = self.get_sim(int(map_ind))
+        actions = self.log.get_actions(epi_ind)
+        state = sim.newGame(tgt_y, tgt_x, bot_y, bot_x)
+        pob = state.pob
+        states = np.zeros((actions.shape[0] + 1, pob.shape[0] * pob.shape[1]))
+        labels = np.zeros(actions.shape[0] + 1, int)
+        states[0] = rgb2gray(pob).reshape(-1)
+        for i in range(actions.shape[0]):
+            state = sim.step(int(actions[i]))
+            states[i+1] = rgb2gray(state.pob).reshape(-1)
+            labels[i+1] = state.action
+        if skip:
+            return states[epi_skip:], labels[epi_skip:]
+        return states, labels
+
+    def render_stacked(self, epi_ind, hist_len):
+        # history stacked states & next action labels of a whole episode,
+        # laid out like TransitionTable.states / TransitionTable.labels
+        states, labels = self.render_episode(epi_ind, skip=False)
+        hist_ind = np.maximum(np.arange(states.shape[0])[:, None] - np.arange(hist_len - 1, -1, -1), 0)
+        next_labels = np.append(labels[1:], 0)
+        return states[hist_ind].reshape(states.shape[0], -1), next_labels
+
+    def __iter__(self): # lazily renders one episode after the other
+        for epi_ind in range(self.log.num_epi):
+            yield self.render_episode(epi_ind)
+
+    def render(self): # states & labels of the whole log in bulk
+        states, labels = zip(*self)
+        return np.concatenate(states), np.concatenate(labels)
+
+    def to_dataset(self, data_dir):
+        # renders the whole log into a binary dataset w/ float32 grayscale frames (see dataset.py)
+        pob_len = self.pob_siz * (1 if self.obs_mode == "grid" else self.cub_siz)
+        writer = DatasetWriter(data_dir, (pob_len * pob_len,), np.float32)
+        for epi_ind, (states, labels) in enumerate(self):
+            writer.append_chunk(states.astype(np.float32), labels.astype(label_dtype),
+                                np.full(labels.shape[0], epi_ind, dtype=np.int32))
+        writer.close()
@@ -1,4 +1,8 @@
 import numpy as np
+# custom modules
+from utils    import cast_frames, FrameHistory
+from dataset  import Dataset
+from prefetch import MinibatchPrefetcher
 
 class TransitionTable:
 
@@ -6,7 +10,7 @@ class TransitionTable:
 
     def __init__(self, state_siz, act_num, hist_len,
                        minibatch_size, valid_size,
-                       states_fil, labels_fil):
+                       states_fil, labels_fil, data_dir=None, store_dtype="float32"):
         self.state_siz = state_siz
         self.act_num = act_num
         self.hist_len  = hist_len
@@ -14,9 +18,14 @@ class TransitionTable:
         self.valid_size = valid_size
         self.states_fil = states_fil
         self.labels_fil = labels_fil
+        self.data_dir = data_dir # binary dataset, used instead of the csv files when given
+        # NOTE: frames loaded from the csv files are kept as store_dtype (those of a binary dataset stay
+        # NOTE: memory mapped as they were written), labels are kept as int8 action indices,
+        # NOTE: states & labels only become float32 & one hot in what get_*() / sample_minibatch() return
+        self.store_dtype = np.dtype(store_dtype)
         self.minibatchInd = None
         self.load_data()
-        self.recent_states = np.zeros([self.hist_len, self.state_siz])
+        self.recent = FrameHistory(self.hist_len, self.state_siz, np.float64)
 
     def __del__(self):
         print("Garbage collected.")
@@ -24,18 +33,14 @@ class TransitionTable:
     # helper funcs
 
     def one_hot(self, labels):
-        classes = np.unique(labels)
-        n_classes = classes.size
-        one_hot_labels = np.zeros(labels.shape + (n_classes,))
-        for c in classes:
-            one_hot_labels[labels == c, c] = 1
+        one_hot_labels = np.zeros(labels.shape + (self.act_num,), dtype=np.float32)
+        one_hot_labels[np.arange(labels.shape[0]), labels] = 1
         return one_hot_labels
 
     def stack_hist(self):
-        # stack history
-        old_states = self.states.copy()
-        self.states = np.zeros([self.size, self.hist_len * self.state_siz])
-        full_state = np.zeros([self.hist_len, self.state_siz])
+        # NOTE: instead of copying every frame hist_len times we only build an index table,
+        # NOTE: row i of hist_ind holds the frame indices that make up the history stacked state i
+        # NOTE: (-1 for zero frames), the states are gathered from the frames when needed
         # use this for indicating the beginning of each of episode (the 1st frame is always w/ label 0)
         old_labels = self.labels.copy()
         # NOTE: the label here is the action that gets the agent into the current state
@@ -43,28 +48,57 @@ class TransitionTable:
         # NOTE: so we move all the labels up by 1 index, and add a 0 for the last frame
         self.labels = np.append(self.labels, [0], 0)
         self.labels = np.delete(self.labels, 0, 0)
-        # labels into one hot encoding
-        self.labels = self.one_hot(self.labels)
-
-        for i in range(self.size):
-            state = old_states[i, :]
-            label = old_labels[i]
-            if label == 0:  # starting of a new episode
-                full_state = np.zeros([self.hist_len, self.state_siz]) # erase current history
-                for j in range(self.hist_len):
-                    full_state[j] = state
-            else:
-                full_state = np.append(full_state, state.reshape(1, self.state_siz), 0)
-                if full_state.shape[0] > self.hist_len: # remove the oldest history
-                    full_state = np.delete(full_state, 0, 0)
-            self.states[i] = full_state.reshape(self.hist_len * self.state_siz)
+
+        # at the start of an episode its first frame fills the whole history, before
+        # the first episode start (if the data does not begin w/ one) the history is zeros
+        # NOTE: a binary dataset knows the episode of every step, an episode then starts wherever the
+        # NOTE: episode id changes (so also at the start of every merged shard, whose 1st frame is not w/ label 0)
+        frame_ind = np.arange(self.size)
+        if self.dataset is not None:
+            episodes = np.asarray(self.dataset.episodes)
+            is_start = np.append([True], episodes[1:] != episodes[:-1])[:self.size]
+        else:
+            is_start = old_labels == 0
+        epi_start = np.maximum.accumulate(np.where(is_start, frame_ind, -1))
+        hist_ind  = frame_ind[:, None] - np.arange(self.hist_len - 1, -1, -1)
+        self.hist_ind = np.where(hist_ind < 0, -1, np.maximum(hist_ind, epi_start[:, None])).astype(np.int32)
+
+    def get_frames(self, ind):
+        if self.dataset is not None:
+            return self.dataset.gray(ind, np.float32)
+        return self.frames[ind].astype(np.float32)
+
+    def get_states(self, ind): # history stacked states for the given indices, as (len(ind), hist_len * state_siz)
+        hist_ind = self.hist_ind[ind]
+        states = self.get_frames(np.maximum(hist_ind, 0).reshape(-1)).reshape(hist_ind.shape + (self.state_siz,))
+        states[hist_ind < 0] = 0
+        return states.reshape(hist_ind.shape[0], self.hist_len * self.state_siz)
+
+    @property
+    def states(self):
+        return self.get_states(np.arange(self.size))
+
+    @property
+    def train_states(self):
+        return self.get_states(self.train_ind)
+
+    @property
+    def valid_states(self):
+        return self.get_states(self.valid_ind)
 
     def load_data(self):
-        self.states = np.loadtxt(self.states_fil, delimiter=',')
-        self.labels = np.loadtxt(self.labels_fil, delimiter=',').astype("int")
-        assert self.states.shape[0] == self.labels.shape[0]
-        self.size   = self.states.shape[0]
-        self.minibatchNum = int(self.size - self.valid_size) / int(self.minibatch_size)
+        if self.data_dir is not None:
+            # frames stay memory mapped & are only read (and converted) when gathered
+            self.dataset = Dataset(self.data_dir)
+            self.frames = self.dataset.frames
+            self.labels = np.asarray(self.dataset.labels, dtype=np.int8)
+        else:
+            self.dataset = None
+            self.frames = cast_frames(np.loadtxt(self.states_fil, delimiter=','), self.store_dtype)
+            self.labels = np.loadtxt(self.labels_fil, delimiter=',').astype(np.int8)
+        assert self.frames.shape[0] == self.labels.shape[0]
+        self.size   = self.frames.shape[0]
+        self.minibatchNum = int(self.size - self.valid_size) // int(self.minibatch_size)
         self.minibatchInd = None
         self.stack_hist()
         print("states & labels loaded.")
@@ -75,33 +109,35 @@ class TransitionTable:
     def split_train_valid(self):
         train_size = self.size - self.valid_size
         shuffled_ind = np.random.permutation(self.size)
-        self.train_states = self.states[shuffled_ind[0:train_size], :].copy()
-        self.train_labels = self.labels[shuffled_ind[0:train_size], :].copy()
-        self.valid_states = self.states[shuffled_ind[train_size:self.size], :].copy()
-        self.valid_labels = self.labels[shuffled_ind[train_size:self.size], :].copy()
+        self.train_ind = shuffled_ind[0:train_size]
+        self.valid_ind = shuffled_ind[train_size:self.size]
+        self.train_labels = self.labels[self.train_ind]
+        self.valid_labels = self.labels[self.valid_ind]
+
+    def nbytes(self): # memory held by the table (a memory mapped dataset is not counted)
+        arrays = [self.hist_ind, self.labels, self.train_ind, self.valid_ind, self.train_labels, self.valid_labels]
+        if self.dataset is None:
+            arrays.append(self.frames)
+        return sum(array.nbytes for array in arrays)
 
     # core funcs
 
     def add_recent(self, epi_step, curr_state):
-        if epi_step == 0: # starting of a new episode
-            self.recent_states = np.zeros([self.hist_len, self.state_siz]) # erase current history
-            for i in range(self.hist_len):
-                self.recent_states[i] = curr_state
+        if epi_step == 0: # starting of a new episode, the first frame fills the whole history
+            self.recent.reset(curr_state.reshape(-1), fill=True)
         else:
-            self.recent_states = np.append(self.recent_states, curr_state.reshape(1, self.state_siz), 0)
-            if self.recent_states.shape[0] > self.hist_len: # remove the oldest history
-                self.recent_states = np.delete(self.recent_states, 0, 0)
+            self.recent.push(curr_state.reshape(-1))
 
-    def get_recent(self):
-        return self.recent_states.copy().reshape(1, self.hist_len * self.state_siz)
+    def get_recent(self): # NOTE: a view that changes w/ the next add_recent(), copy it to keep it
+        return self.recent.get().reshape(1, self.hist_len * self.state_siz)
 
     # to be used for NeuralPlanner.learn()
     def get_train(self):
-        return self.train_states.copy(), self.train_labels.copy()
+        return self.train_states, self.one_hot(self.train_labels)
 
     # to be used for NeuralPlanner.learn()
     def get_valid(self):
-        return self.valid_states.copy(), self.valid_labels.copy()
+        return self.valid_states, self.one_hot(self.valid_labels)
 
     # to be used for NeuralPlanner.learn_minibatch()
     def sample_minibatch(self, batch_size=None): # when called w/o args, get minibatch_size using fixed shuffled indices
@@ -113,4 +149,29 @@ class TransitionTable:
         if self.minibatchInd == 0: # ran through an epoch, now get another shuffled ind for next epoch
             self.minibatchOrder = np.random.permutation(self.size - self.valid_size)
         current_ind = self.minibatchOrder[self.minibatchInd*self.minibatch_size : (self.minibatchInd+1)*self.minibatch_size]
-        return self.train_states[current_ind, :].copy(), self.train_labels[current_ind, :].copy()
+        return self.get_states(self.train_ind[current_ind]), self.one_hot(self.train_labels[current_ind])
+
+    # to be used instead of sample_minibatch() when the minibatches should be built in the background
+    def iterate_minibatches(self, num_epochs=None, num_buf=3):
+        # float32 (states, labels) minibatches of minibatch_size, built by a background thread,
+        # each epoch runs through a new shuffled order of the training data in minibatchNum
+        # minibatches; stops after num_epochs (never for None)
+        def epoch_ind():
+            epoch = 0
+            while num_epochs is None or epoch < num_epochs:
+                minibatchOrder = np.random.permutation(self.size - self.valid_size)
+                for i in range(self.minibatchNum):
+                    yield minibatchOrder[i*self.minibatch_size : (i+1)*self.minibatch_size]
+                epoch += 1
+        batch_ind = epoch_ind()
+
+        def fill(bufs):
+            current_ind = next(batch_ind, None)
+            if current_ind is None:
+                return False
+            bufs[0][:] = self.get_states(self.train_ind[current_ind])
+            bufs[1][:] = self.one_hot(self.train_labels[current_ind])
+            return True
+
+        return MinibatchPrefetcher(fill, [(self.minibatch_size, self.hist_len * self.state_siz),
+                                          (self.minibatch_size, self.act_num)], num_buf)
@@ -25,20 +25,39 @@ class Options:
         tgt_y = 5
         tgt_x = 5
         early_stop = 75
-    state_siz = (pob_siz * cub_siz) ** 2 # when use pob as input
+    obs_mode = "pixel" # "grid": pob w/ one pixel per map cell instead of cub_siz x cub_siz, see upsample_grid
+    if obs_mode == "grid":
+        state_siz = pob_siz ** 2
+    else:
+        state_siz = (pob_siz * cub_siz) ** 2 # when use pob as input
     if change_tgt:
         tgt_y = None
         tgt_x = None
     act_num = 5
+    # expert
+    use_oracle = False      # look up expert actions in per tgt distance fields instead of running A* per episode
+    oracle_mem = 64 * 2**20 # bytes of distance fields kept in the oracle's LRU cache
 
     # traing hyper params
     hist_len = 4
     minibatch_size  = 32
+    store_dtype     = "float32" # frames kept in the TransitionTable: float64, float32, float16 or uint8 (rounded)
     n_minibatches   = 500
     valid_size      = 500
     eval_nepisodes  = 10
+    eval_num_env    = 100 # #episodes test_agent.py runs at the same time
+    eval_seed       = 0   # fixed episodes for comparable evaluations, None: new ones each time
 
     data_steps  = n_minibatches * minibatch_size + valid_size
+    data_workers = 1    # #processes that collect data in parallel (get_data.py)
+    data_seed    = None # root seed of the data collection, None: fresh (recorded in the manifest)
+    shard_dir    = "shards"
+    manifest_fil = "manifest.json"
+    data_fmt     = "bin"     # "bin": binary dataset in data_dir (see dataset.py), "csv": states_fil & labels_fil,
+                             # "traj": only log the trajectories into traj_fil (see trajlog.py)
+    data_dir     = "data"
+    traj_fil     = "data.traj.npz"
+    frame_dtype  = "float32" # frames in data_dir: "float32" grayscale or "uint8" rgb pobs
     eval_steps  = early_stop * eval_nepisodes
     eval_freq   = n_minibatches # evaluate after each epoch
     prog_freq   = 500
@@ -64,3 +83,82 @@ def rgb2gray(rgb):
     gray[:] += 0.0721 * rgb[..., 2]
 
     return gray
+
+def upsample_grid(grid, cub_siz):
+    # turn a grid pob (..., pob_siz, pob_siz, 3) into the pixel pob, i.e. each cell into a cub_siz x cub_siz cube
+    return grid.repeat(cub_siz, axis=-3).repeat(cub_siz, axis=-2)
+
+def cast_frames(frames, dtype):
+    # frames as dtype, integer dtypes get the values rounded (and clipped) instead of truncated
+    dtype = np.dtype(dtype)
+    if dtype.kind in "ui":
+        frames = np.clip(np.rint(frames), np.iinfo(dtype).min, np.iinfo(dtype).max)
+    return np.asarray(frames, dtype=dtype)
+
+
+class FrameHistory:
+
+    # the last hist_len frames of an episode in a preallocated ring buffer, for stacking states
+    # NOTE: the ring holds hist_len + 1 frames twice over (each frame is written to row i & row i + hist_len + 1),
+    # NOTE: so the last hist_len + 1 frames are always one contiguous block: get() & get_prev() are views
+    # NOTE: into it w/o any copying, which stay valid until the next push() / reset()
+
+    def __init__(self, hist_len, state_siz, dtype=np.float32):
+        self.hist_len = hist_len
+        self.state_siz = state_siz
+        self.ring_len = hist_len + 1
+        self.frames = np.zeros((2 * self.ring_len, state_siz), dtype=dtype)
+        self.pos = 0 # row of the newest frame
+
+    def reset(self, frame, fill=False):
+        # starts a new episode w/ frame, the older frames are zeros (or frame as well w/ fill)
+        self.frames[:] = frame if fill else 0
+        self.pos = 0
+        self.frames[self.pos] = frame
+        self.frames[self.pos + self.ring_len] = frame
+
+    def push(self, frame):
+        self.pos = (self.pos + 1) % self.ring_len
+        self.frames[self.pos] = frame
+        self.frames[self.pos + self.ring_len] = frame
+
+    def get(self): # the stacked state (hist_len * state_siz) up to the newest frame
+        return self.frames[self.pos + 2 : self.pos + 2 + self.hist_len].reshape(-1)
+
+    def get_prev(self): # the stacked state before the last push(), i.e. the state the last transition started in
+        return self.frames[self.pos + 1 : self.pos + 1 + self.hist_len].reshape(-1)
+
+
+class BatchFrameHistory:
+
+    # FrameHistory for num_env envs that are stepped together (e.g. by a VecSimulator),
+    # get() & get_prev() are (num_env, hist_len * state_siz) views
+
+    def __init__(self, num_env, hist_len, state_siz, dtype=np.float32):
+        self.num_env = num_env
+        self.hist_len = hist_len
+        self.state_siz = state_siz
+        self.ring_len = hist_len + 1
+        self.frames = np.zeros((num_env, 2 * self.ring_len, state_siz), dtype=dtype)
+        self.pos = 0
+
+    def reset(self, frames, fill=False): # starts a new episode in every env
+        self.frames[:] = frames[:, None] if fill else 0
+        self.pos = 0
+        self.frames[:, self.pos] = frames
+        self.frames[:, self.pos + self.ring_len] = frames
+
+    def push(self, frames, new_episode=None, fill=False):
+        # frames: (num_env, state_siz), new_episode: bool mask of the envs whose frame starts a new episode
+        # (their older frames become zeros, or their new frame w/ fill)
+        self.pos = (self.pos + 1) % self.ring_len
+        if new_episode is not None and np.any(new_episode):
+            self.frames[new_episode] = frames[new_episode][:, None] if fill else 0
+        self.frames[:, self.pos] = frames
+        self.frames[:, self.pos + self.ring_len] = frames
+
+    def get(self):
+        return self.frames[:, self.pos + 2 : self.pos + 2 + self.hist_len].reshape(self.num_env, -1)
+
+    def get_prev(self):
+        return self.frames[:, self.pos + 1 : self.pos + 1 + self.hist_len].reshape(self.num_env, -1)
@@ -0,0 +1,166 @@
+import numpy as np
+import multiprocessing as mp
+import copy
+try:
+    import queue
+except ImportError: # python 2
+    import Queue as queue
+# custom modules
+from utils     import BatchFrameHistory
+from simulator import Simulator
+from atlas     import ObsAtlas
+
+def sample_episodes(opt, fre_pos, num_episodes, seed):
+    # (tgt, bot) start positions of num_episodes episodes, the same ones for the same seed
+    # (the tgt is opt.tgt_y, opt.tgt_x unless they are None, like in Simulator.newGame)
+    # NOTE: bots that would start on their tgt are drawn again, those episodes would be solved w/o any step
+    rng = np.random.RandomState(seed)
+    if opt.tgt_y is not None and opt.tgt_x is not None:
+        tgt_pos = np.tile([opt.tgt_y, opt.tgt_x], (num_episodes, 1))
+    else:
+        tgt_pos = fre_pos[rng.randint(fre_pos.shape[0], size=num_episodes)]
+    bot_pos = fre_pos[rng.randint(fre_pos.shape[0], size=num_episodes)]
+    on_tgt = np.flatnonzero(np.all(bot_pos == tgt_pos, axis=1))
+    while on_tgt.shape[0] > 0:
+        bot_pos[on_tgt] = fre_pos[rng.randint(fre_pos.shape[0], size=on_tgt.shape[0])]
+        on_tgt = on_tgt[np.all(bot_pos[on_tgt] == tgt_pos[on_tgt], axis=1)]
+    return tgt_pos, bot_pos
+
+def evaluate(opt, q_fn, params, sims, atlas, hist, num_episodes, epsilon, seed):
+    # runs num_episodes episodes on the Simulators in sims (one episode per sim at a time) w/ the
+    # (epsilon) greedy policy on q_fn(params, states), returns a dict w/ success_rate, mean_steps
+    # (#steps per episode, early_stop for the unsolved ones) & mean return
+    # NOTE: the start positions of all episodes are drawn up front from seed, so the same seed always
+    # NOTE: gives the same episodes, no matter which sim runs which episode
+    # NOTE: like in train_agent.py the history of a new episode is zero padded (not filled w/ its 1st frame)
+    num_env = len(sims)
+    rng = np.random.RandomState(seed)
+    tgt_pos, bot_pos = sample_episodes(opt, sims[0].fre_pos, num_episodes, seed)
+    solved, steps, ret = [], [], []
+    epi_step = np.zeros(num_env, int)
+    epi_ret = np.zeros(num_env)
+    active = np.zeros(num_env, bool)
+    frames = np.zeros((num_env, opt.state_siz), dtype=np.float32)
+    for i in range(min(num_env, num_episodes)):
+        sims[i].newGame(tgt_pos[i][0], tgt_pos[i][1], bot_pos[i][0], bot_pos[i][1])
+        frames[i] = atlas.lookup_sim(sims[i])[1].reshape(-1)
+        active[i] = True
+    started = int(np.sum(active))
+    hist.reset(frames)
+    while np.any(active):
+        actions = np.argmax(q_fn(params, hist.get()), axis=1)
+        explore = rng.rand(num_env) < epsilon
+        actions[explore] = rng.randint(opt.act_num, size=int(np.sum(explore)))
+        new_episode = np.zeros(num_env, bool)
+        for i in np.flatnonzero(active):
+            state = sims[i].step(int(actions[i]))
+            epi_step[i] += 1
+            epi_ret[i] += state.reward
+            if state.terminal or epi_step[i] >= opt.early_stop:
+                solved.append(state.terminal)
+                steps.append(epi_step[i])
+                ret.append(epi_ret[i])
+                epi_step[i] = 0
+                epi_ret[i] = 0.
+                if started < num_episodes: # the next episode
+                    sims[i].newGame(tgt_pos[started][0], tgt_pos[started][1], bot_pos[started][0], bot_pos[started][1])
+                    started += 1
+                    new_episode[i] = True
+                else:
+                    active[i] = False
+            frames[i] = atlas.lookup_sim(sims[i])[1].reshape(-1)
+        hist.push(frames, new_episode)
+    return {"episodes": len(solved),
+            "success_rate": float(np.mean(solved)),
+            "mean_steps": float(np.mean(steps)),
+            "ret": float(np.mean(ret))}
+
+def eval_worker(opt, q_fn, num_env, num_episodes, epsilon, seed, requests, results):
+    # evaluates the params of every request (step, params) & puts (step, result) into results
+    sims = [Simulator(opt.map_ind, opt.cub_siz, opt.pob_siz, opt.act_num, opt.obs_mode) for _ in range(num_env)]
+    atlas = ObsAtlas(opt.map_ind, opt.cub_siz, opt.pob_siz, obs_mode=opt.obs_mode)
+    hist = BatchFrameHistory(num_env, opt.hist_len, opt.state_siz)
+    try:
+        while True:
+            request = requests.get()
+            if request is None:
+                break
+            step, params = request
+            try:
+                result = evaluate(opt, q_fn, params, sims, atlas, hist, num_episodes, epsilon, seed)
+            except Exception as e: # hand it over to the trainer
+                result = e
+            results.put((step, result))
+    except KeyboardInterrupt:
+        pass
+
+
+class AsyncEvaluator:
+
+    # evaluates snapshots of the Q network params in a background process while training goes on:
+    #     evaluator = AsyncEvaluator(opt, q_fn, opt.eval_nepisodes)
+    #     while training:
+    #         ... train ...
+    #         if step % opt.eval_freq == 0:
+    #             evaluator.submit(step, params)
+    #         for eval_step, result in evaluator.poll():
+    #             ... log result["success_rate"], result["mean_steps"] ...
+    #     evaluator.close()
+    # NOTE: q_fn(params, states) -> Q values runs in the evaluator process, so like for the actors of
+    # NOTE: shared_replay.py it must only use numpy & params (e.g. the weights fetched from your session),
+    # NOTE: params is copied on submit(), training can change it right away
+    # NOTE: submit() never waits, if the evaluator is still busy w/ max_pending snapshots the new one is dropped
+    # NOTE: every evaluation runs the same start positions (given by seed), so the results form a learning curve
+
+    def __init__(self, opt, q_fn, num_episodes, num_env=10, epsilon=0., seed=0, max_pending=1):
+        self.closed = True
+        ctx = mp.get_context("fork")
+        self.requests = ctx.Queue()
+        self.results = ctx.Queue()
+        self.max_pending = max_pending
+        self.pending = 0 # #snapshots submitted whose results did not come back yet
+        self.history = [] # all (step, result) received so far
+        self.proc = ctx.Process(target=eval_worker,
+                                args=(opt, q_fn, min(num_env, num_episodes), num_episodes, epsilon, seed,
+                                      self.requests, self.results))
+        self.proc.daemon = True # the evaluator dies w/ the main process
+        self.proc.start()
+        self.closed = False
+
+    def __del__(self):
+        self.close()
+
+    def submit(self, step, params): # returns whether the snapshot of params is going to be evaluated
+        if self.pending >= self.max_pending:
+            self.poll()
+            if self.pending >= self.max_pending:
+                return False
+        self.requests.put((step, copy.deepcopy(params)))
+        self.pending += 1
+        return True
+
+    def poll(self, block=False):
+        # the (step, result) pairs that came back since the last poll (w/ block: waits for all pending ones)
+        new = []
+        while self.pending > 0:
+            try:
+                step, result = self.results.get(block)
+            except queue.Empty:
+                break
+            self.pending -= 1
+            if isinstance(result, Exception):
+                raise result
+            new.append((step, result))
+        self.history += new
+        return new
+
+    def close(self, wait=False): # w/ wait: collect the results of the pending snapshots first
+        if getattr(self, "closed", True):
+            return
+        if wait:
+            self.poll(block=True)
+        self.closed = True
+        self.requests.put(None)
+        self.proc.join(timeout=5)
+        if self.proc.is_alive():
+            self.proc.terminate()
@@ -0,0 +1,83 @@
+import numpy as np
+# custom modules
+from utils import rgb2gray, upsample_grid
+from maps  import maps, border_siz
+
+class ObsAtlas:
+
+    # the pob (and its grayscale version) only depends on the map, the bot cell and the tgt cell,
+    # so we render it once per free bot cell into contiguous arrays indexed by free cell id
+    # (ids follow the row major order of Simulator.fre_pos); the few bot cells that see the tgt
+    # get their own entries, built once per tgt
+    # NOTE: pobs are bit-identical to Simulator.state_pob (w/ the same obs_mode), grays to rgb2gray(pob) when gray_dtype is float64
+    # NOTE: in lazy mode entries are only rendered when they are first looked up
+
+    def __init__(self, map_ind, cub_siz, pob_siz, lazy=False, gray_dtype=np.float32, obs_mode="pixel"):
+        self.map_ind = map_ind
+        self.cub_siz = cub_siz
+        self.drw_siz = 1 if obs_mode == "grid" else cub_siz
+        self.pob_siz = pob_siz
+        self.lazy    = lazy
+        self.bot_clr_ind = 2 # blue
+        self.tgt_clr_ind = 1 # green
+        self.obs_clr_ind = 0 # red
+        self.map     = maps[self.map_ind]
+        assert border_siz(self.map) >= self.pob_siz // 2, "map %s needs a border wall of at least pob_siz // 2 = %d cells" % (self.map_ind, self.pob_siz // 2)
+        self.map_hei = self.map.shape[0]
+        self.map_wid = self.map.shape[1]
+        self.pob_edg = self.pob_siz // 2
+        self.fre_pos = np.argwhere(self.map == 0)
+        self.fre_ind = np.full((self.map_hei, self.map_wid), -1, dtype=np.int64) # cell -> free cell id
+        self.fre_ind[self.fre_pos[:, 0], self.fre_pos[:, 1]] = np.arange(self.fre_pos.shape[0])
+        pob_len = self.pob_siz * self.drw_siz
+        self.pob_atlas  = np.zeros((self.fre_pos.shape[0], pob_len, pob_len, 3), dtype=np.uint8)
+        self.gray_atlas = np.zeros((self.fre_pos.shape[0], pob_len * pob_len), dtype=gray_dtype)
+        self.filled     = np.zeros(self.fre_pos.shape[0], bool)
+        self.tgt_atlas  = {} # (tgt_y, tgt_x, fre id): (pob, gray) for bot cells that have tgt in view
+        if not self.lazy:
+            self.fill(np.arange(self.fre_pos.shape[0]))
+
+    # helper funcs
+
+    def fill(self, fre_ids): # render the pobs (w/o tgt) for the given free cell ids
+        pob_off = np.arange(-self.pob_edg, self.pob_edg + 1)
+        pob_y = self.fre_pos[fre_ids, 0, None] + pob_off
+        pob_x = self.fre_pos[fre_ids, 1, None] + pob_off
+        pob_grid = np.zeros((fre_ids.shape[0], self.pob_siz, self.pob_siz, 3), dtype=np.uint8)
+        pob_grid[..., self.obs_clr_ind] = self.map[pob_y[:, :, None], pob_x[:, None, :]] * 255
+        pob_grid[:, self.pob_edg, self.pob_edg, self.bot_clr_ind] = 255
+        pob = upsample_grid(pob_grid, self.drw_siz)
+        self.pob_atlas[fre_ids]  = pob
+        self.gray_atlas[fre_ids] = rgb2gray(pob).reshape(fre_ids.shape[0], -1)
+        self.filled[fre_ids] = True
+
+    def fill_tgt(self, fre_id, bot_y, bot_x, tgt_y, tgt_x): # copy the entry & draw the tgt cube into it
+        pob = self.pob_atlas[fre_id].copy()
+        y1 = self.drw_siz * (tgt_y - bot_y + self.pob_edg)
+        x1 = self.drw_siz * (tgt_x - bot_x + self.pob_edg)
+        pob[y1:y1+self.drw_siz, x1:x1+self.drw_siz, self.tgt_clr_ind] = 255
+        gray = rgb2gray(pob).reshape(-1).astype(self.gray_atlas.dtype)
+        self.tgt_atlas[(tgt_y, tgt_x, fre_id)] = (pob, gray)
+
+    # core funcs
+
+    def lookup(self, bot_y, bot_x, tgt_y, tgt_x): # returns (pob, gray), do not write into them
+        bot_y, bot_x, tgt_y, tgt_x = int(bot_y), int(bot_x), int(tgt_y), int(tgt_x)
+        fre_id = self.fre_ind[bot_y, bot_x]
+        if not self.filled[fre_id]:
+            self.fill(np.array([fre_id]))
+        if abs(tgt_y - bot_y) > self.pob_edg or abs(tgt_x - bot_x) > self.pob_edg: # tgt not in view
+            return self.pob_atlas[fre_id], self.gray_atlas[fre_id]
+        if (tgt_y, tgt_x, fre_id) not in self.tgt_atlas:
+            self.fill_tgt(fre_id, bot_y, bot_x, tgt_y, tgt_x)
+        return self.tgt_atlas[(tgt_y, tgt_x, fre_id)]
+
+    def pob(self, bot_y, bot_x, tgt_y, tgt_x):
+        return self.lookup(bot_y, bot_x, tgt_y, tgt_x)[0]
+
+    def gray(self, bot_y, bot_x, tgt_y, tgt_x):
+        return self.lookup(bot_y, bot_x, tgt_y, tgt_x)[1]
+
+    def lookup_sim(self, sim): # (pob, gray) for the current state of a Simulator
+        return self.lookup(sim.obj_pos[sim.bot_ind][0], sim.obj_pos[sim.bot_ind][1],
+                           sim.obj_pos[sim.tgt_ind][0], sim.obj_pos[sim.tgt_ind][1])
@@ -0,0 +1,39 @@
+import numpy as np
+# custom modules
+from utils           import Options
+from transitionTable import TransitionTable, FrameTransitionTable
+
+# memory footprint of the replay memory of train_agent.py for each storage dtype
+# NOTE: np.zeros only reserves the memory, the pages are not touched here
+
+opt = Options()
+maxlen = 100000
+
+def fmt(nbytes):
+    return "%8.1f MB" % (nbytes / 2.**20)
+
+# the layout before the storage dtypes: everything float64, actions one hot
+state_len = opt.state_siz * opt.hist_len
+legacy = maxlen * (2 * state_len + opt.act_num + 1 + 1) * 8
+print("state_siz %d, hist_len %d, %d transitions" % (opt.state_siz, opt.hist_len, maxlen))
+print("%-26s %s" % ("float64 + one hot (before)", fmt(legacy)))
+for store_dtype in ["float64", "float32", "float16", "uint8"]:
+    trans = TransitionTable(opt.state_siz, opt.act_num, opt.hist_len, opt.minibatch_size, maxlen, store_dtype)
+    nbytes = trans.nbytes()
+    print("%-26s %s  (%.1fx smaller)" % (store_dtype, fmt(nbytes), legacy / float(nbytes)))
+    del trans
+for n_transitions in [maxlen, 1000000]:
+    for store_dtype in ["float32", "uint8"]:
+        trans = FrameTransitionTable(opt.state_siz, opt.act_num, opt.hist_len, opt.minibatch_size, n_transitions, store_dtype)
+        nbytes = trans.nbytes()
+        print("%-26s %s  (%.1fx smaller)" % ("frames %s, %dk" % (store_dtype, n_transitions // 1000), fmt(nbytes),
+                                             legacy * (n_transitions // maxlen) / float(nbytes)))
+        del trans
+
+# the values kept for the different dtypes
+trans = TransitionTable(opt.state_siz, opt.act_num, opt.hist_len, opt.minibatch_size, 10, "uint8")
+state = np.random.rand(state_len).astype(np.float32) * 255
+trans.add(state, 2, state, -0.04, False)
+state_batch, action_batch, _, _, terminal_batch = trans.sample_minibatch()
+print("uint8 max abs error %.3f, sampled dtypes %s %s %s" % (np.abs(state_batch[0] - state).max(),
+      state_batch.dtype, action_batch.dtype, terminal_batch.dtype))
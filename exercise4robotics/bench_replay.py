@@ -0,0 +1,71 @@
+import numpy as np
+import time
+# custom modules
+from utils           import Options
+from transitionTable import TransitionTable, FrameTransitionTable
+
+# replay memory microbenchmark: samples/s of the vectorized sample_minibatch() against the
+# per row loop it replaced & transitions/s of add_batch() against add()
+
+def sample_minibatch_ref(trans, batch_size):
+    # the previous implementation: one randint & five take() calls per row
+    state      = np.zeros((batch_size, trans.state_siz*trans.hist_len), dtype=np.float32)
+    action     = np.zeros((batch_size, trans.act_num), dtype=np.float32)
+    next_state = np.zeros((batch_size, trans.state_siz*trans.hist_len), dtype=np.float32)
+    reward     = np.zeros((batch_size, 1), dtype=np.float32)
+    terminal   = np.zeros((batch_size, 1), dtype=np.float32)
+    for i in range(batch_size):
+        index = np.random.randint(trans.bottom, trans.bottom + trans.size)
+        state[i]         = trans.states.take(index, axis=0, mode='wrap')
+        action[i, trans.actions.take(index, mode='wrap')] = 1
+        next_state[i]    = trans.next_states.take(index, axis=0, mode='wrap')
+        reward[i]        = trans.rewards.take(index, axis=0, mode='wrap')
+        terminal[i]      = trans.terminal.take(index, axis=0, mode='wrap')
+    return state, action, next_state, reward, terminal
+
+def rate(fn, n_items, min_time=1.):
+    # items/s of fn() (which handles n_items per call)
+    n_calls = 0
+    start = time.time()
+    while time.time() - start < min_time:
+        fn()
+        n_calls += 1
+    return n_calls * n_items / (time.time() - start)
+
+opt = Options()
+maxlen = 10000
+num_env = 16
+state_len = opt.state_siz * opt.hist_len
+states  = np.random.rand(num_env, state_len).astype(np.float32) * 255
+actions = np.random.randint(opt.act_num, size=num_env)
+rewards = np.full(num_env, -0.04)
+terminals = np.zeros(num_env, dtype=bool)
+
+for store_dtype in ["float32", "uint8"]:
+    trans = TransitionTable(opt.state_siz, opt.act_num, opt.hist_len, opt.minibatch_size, maxlen, store_dtype)
+    for _ in range(maxlen // num_env + 1): # fill up (& wrap around)
+        trans.add_batch(states, actions, states, rewards, terminals)
+    # both draw the same rows from the same random state
+    np.random.seed(0)
+    ref = sample_minibatch_ref(trans, opt.minibatch_size)[0]
+    np.random.seed(0)
+    assert np.array_equal(ref, trans.sample_minibatch()[0])
+    print("%s, %d transitions" % (store_dtype, trans.size))
+    for batch_size in [32, 256]:
+        ref_rate = rate(lambda: sample_minibatch_ref(trans, batch_size), batch_size)
+        vec_rate = rate(lambda: trans.sample_minibatch(batch_size), batch_size)
+        print("  sample batch %3d: loop %9.0f samples/s, vectorized %9.0f samples/s (%.1fx)"
+              % (batch_size, ref_rate, vec_rate, vec_rate / ref_rate))
+    def add_loop():
+        for i in range(num_env):
+            trans.add(states[i], actions[i], states[i], rewards[i], terminals[i])
+    add_rate = rate(add_loop, num_env)
+    batch_rate = rate(lambda: trans.add_batch(states, actions, states, rewards, terminals), num_env)
+    print("  add %d envs:      add() %9.0f transitions/s, add_batch() %9.0f transitions/s (%.1fx)"
+          % (num_env, add_rate, batch_rate, batch_rate / add_rate))
+
+trans = FrameTransitionTable(opt.state_siz, opt.act_num, opt.hist_len, opt.minibatch_size, maxlen)
+for i in range(maxlen):
+    trans.add(states[0], actions[0], states[0], rewards[0], terminals[0])
+print("frames float32, %d transitions" % trans.size)
+print("  sample batch  32: %9.0f samples/s" % rate(lambda: trans.sample_minibatch(32), 32))
@@ -0,0 +1,40 @@
+import numpy as np
+import multiprocessing as mp
+import time
+# custom modules
+from utils     import Options
+from simulator import Simulator, VecSimulator
+from subproc_simulator import SubprocVecSimulator
+
+# throughput (env steps/s) of one Simulator, one VecSimulator and SubprocVecSimulator w/ K workers
+
+opt = Options()
+n_steps = 200
+env_per_worker = 64
+
+def bench_vec(vsim, num_env, n_steps):
+    vsim.newGame(opt.tgt_y, opt.tgt_x)
+    actions = np.random.randint(opt.act_num, size=(n_steps, num_env))
+    start = time.time()
+    for step in range(n_steps):
+        vsim.step(actions[step])
+    return n_steps * num_env / (time.time() - start)
+
+sim = Simulator(opt.map_ind, opt.cub_siz, opt.pob_siz, opt.act_num, opt.obs_mode)
+sim.newGame(opt.tgt_y, opt.tgt_x)
+start = time.time()
+for step in range(n_steps * 10):
+    sim.step(np.random.randint(opt.act_num))
+print("Simulator:                %10.0f steps/s" % (n_steps * 10 / (time.time() - start)))
+
+vsim = VecSimulator(opt.map_ind, opt.cub_siz, opt.pob_siz, opt.act_num, env_per_worker, opt.early_stop, obs_mode=opt.obs_mode)
+print("VecSimulator (%3d envs):  %10.0f steps/s" % (env_per_worker, bench_vec(vsim, env_per_worker, n_steps)))
+
+num_worker = 1
+while num_worker <= mp.cpu_count():
+    vsim = SubprocVecSimulator(opt.map_ind, opt.cub_siz, opt.pob_siz, opt.act_num, num_worker, env_per_worker,
+                               opt.early_stop, opt.obs_mode)
+    steps_per_sec = bench_vec(vsim, vsim.num_env, n_steps)
+    vsim.close()
+    print("Subproc K=%2d (%4d envs): %10.0f steps/s" % (num_worker, num_worker * env_per_worker, steps_per_sec))
+    num_worker *= 2
@@ -0,0 +1,74 @@
+import numpy as np
+import threading
+try:
+    import queue
+except ImportError: # python 2
+    import Queue as queue
+
+class MinibatchPrefetcher:
+
+    # builds minibatches in a background thread into num_buf preallocated buffers (float32 unless dtypes says otherwise)
+    # fill_fn(bufs) writes the next minibatch into the tuple of arrays bufs (shaped like shapes)
+    # and returns False once there are no more minibatches
+    # NOTE: the arrays handed out by next() are reused, they are only valid until the following next()
+
+    def __init__(self, fill_fn, shapes, num_buf=3, dtypes=None):
+        self.fill_fn = fill_fn
+        if dtypes is None:
+            dtypes = [np.float32] * len(shapes)
+        self.bufs = [tuple(np.zeros(shape, dtype=dtype) for shape, dtype in zip(shapes, dtypes)) for _ in range(num_buf)]
+        self.free = queue.Queue() # indices of buffers the thread may fill
+        self.full = queue.Queue() # indices of filled buffers (None: end, Exception: failure)
+        for buf_ind in range(num_buf):
+            self.free.put(buf_ind)
+        self.last = None  # buffer currently held by the consumer
+        self.stop = False
+        self.done = False
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __del__(self):
+        self.close()
+
+    def run(self):
+        try:
+            while True:
+                buf_ind = self.free.get()
+                if self.stop or buf_ind is None:
+                    break
+                if not self.fill_fn(self.bufs[buf_ind]):
+                    self.full.put(None)
+                    break
+                self.full.put(buf_ind)
+        except Exception as e: # hand it over to the consumer
+            self.full.put(e)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.done:
+            raise StopIteration
+        if self.last is not None: # the consumer is done w/ the previous buffer
+            self.free.put(self.last)
+            self.last = None
+        buf_ind = self.full.get()
+        if buf_ind is None:
+            self.done = True
+            raise StopIteration
+        if isinstance(buf_ind, Exception):
+            self.done = True
+            raise buf_ind
+        self.last = buf_ind
+        return self.bufs[buf_ind]
+
+    next = __next__ # python 2
+
+    def close(self):
+        if getattr(self, "stop", True):
+            return
+        self.stop = True
+        self.done = True
+        self.free.put(None) # wake the thread up if it waits for a buffer
+        self.thread.join()
@@ -0,0 +1,113 @@
+import numpy as np
+# custom modules
+from transitionTable import TransitionTable
+
+class SumTree:
+
+    # binary tree over capacity leaves in one array: node i has the children 2i & 2i+1,
+    # the leaves are nodes capacity .. 2 * capacity - 1 (capacity is rounded up to a power of 2)
+    # & every inner node holds the sum of its children, so the root (node 1) holds the total
+    # NOTE: updates & lookups are done for whole batches, one numpy op per tree level
+
+    def __init__(self, size):
+        self.size = size
+        self.depth = max(int(np.ceil(np.log2(size))), 0)
+        self.capacity = 2 ** self.depth
+        self.tree = np.zeros(2 * self.capacity)
+
+    def total(self):
+        return self.tree[1]
+
+    def get(self, indices):
+        return self.tree[self.capacity + np.asarray(indices)]
+
+    def update(self, indices, values):
+        # sets the leaves at indices to values, w/ repeated indices the last value wins
+        nodes = self.capacity + np.asarray(indices, dtype=np.int64).reshape(-1)
+        self.tree[nodes] = np.asarray(values, dtype=np.float64).reshape(-1)
+        for _ in range(self.depth):
+            nodes = np.unique(nodes // 2)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def find(self, values):
+        # leaf indices i w/ sum(leaves[:i]) <= value < sum(leaves[:i+1]) for each value in [0, total)
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(values.shape, dtype=np.int64)
+        for _ in range(self.depth):
+            left = self.tree[2 * nodes]
+            right = values >= left
+            values -= left * right
+            nodes = 2 * nodes + right
+        # rounding can walk past the last non empty leaf
+        return np.minimum(nodes - self.capacity, self.size - 1)
+
+
+class PrioritizedTransitionTable(TransitionTable):
+
+    # TransitionTable that samples transition i w/ probability P(i) = p_i^alpha / sum_k p_k^alpha
+    # (prioritized experience replay), where p_i = |td error of i| + eps
+    # new transitions get the highest priority seen so far, so each is replayed at least once soon,
+    # sample_minibatch() also returns the importance sampling weights (N * P(i))^-beta (divided by
+    # their max in the minibatch) to weight the loss w/ & the table indices to pass to update_priorities()
+    # NOTE: the batch is stratified, i.e. one transition is drawn from each of batch_size equal parts of the total
+    # NOTE: priorities updated for indices that were overwritten since the sampling land on the new transitions
+
+    # basic funcs
+
+    def __init__(self, state_siz, act_num, hist_len,
+                       minibatch_size, max_transitions, store_dtype="float32",
+                       alpha=0.6, beta=0.4, eps=1e-6, replay_dir=None, n_step=1, discount=0.99):
+        TransitionTable.__init__(self, state_siz, act_num, hist_len, minibatch_size, max_transitions, store_dtype,
+                                 replay_dir, n_step=n_step, discount=discount)
+        self.alpha = alpha
+        self.beta = beta # you might want to anneal this to 1 over the training
+        self.eps = eps
+        self.max_priority = 1.
+        self.tree = SumTree(max_transitions)
+        # the priorities are not persisted, transitions resumed from a replay_dir start out w/ the same one
+        self.tree.update((self.bottom + np.arange(self.size)) % max_transitions, np.ones(self.size))
+
+    # helper funcs
+
+    def put(self, state, action, next_state, reward, terminal, discount):
+        with self.lock:
+            index = self.top
+            TransitionTable.put(self, state, action, next_state, reward, terminal, discount)
+            self.tree.update([index], [self.max_priority ** self.alpha])
+
+    def put_batch(self, states, actions, next_states, rewards, terminals):
+        with self.lock:
+            TransitionTable.put_batch(self, states, actions, next_states, rewards, terminals)
+            n = min(actions.shape[0], self.max_transitions)
+            index = (self.top - n + np.arange(n)) % self.max_transitions
+            self.tree.update(index, np.full(n, self.max_priority ** self.alpha))
+
+    def update_priorities(self, indices, td_errors):
+        # new priorities for the transitions at indices (as returned by sample_minibatch)
+        priorities = np.abs(np.asarray(td_errors, dtype=np.float64).reshape(-1)) + self.eps
+        with self.lock:
+            self.tree.update(indices, priorities ** self.alpha)
+            self.max_priority = max(self.max_priority, priorities.max())
+
+    def sample_minibatch(self, batch_size=None):
+        # (state, action, next_state, reward, terminal[, discount], weight, index), weight is Nx1 & index N
+        if batch_size is None:
+            batch_size = self.batch_size
+        with self.lock:
+            assert self.size > 0, "cannot sample from an empty PrioritizedTransitionTable"
+            total = self.tree.total()
+            values = (np.arange(batch_size) + np.random.uniform(size=batch_size)) * (total / batch_size)
+            index = self.tree.find(np.minimum(values, np.nextafter(total, 0)))
+            # rounding can still land on an empty slot (w/ priority 0) past the valid ones, which are not
+            # necessarily 0 .. size - 1 (e.g. resumed w/ bottom != 0), take the newest transition instead
+            index[self.tree.get(index) <= 0] = (self.top - 1) % self.max_transitions
+            prob = self.tree.get(index) / total
+            weight = (self.size * prob) ** -self.beta
+            weight = (weight / weight.max()).astype(np.float32).reshape(batch_size, 1)
+            return self.gather(index) + (weight, index)
+
+    def nbytes(self): # memory held by the table
+        return TransitionTable.nbytes(self) + self.tree.tree.nbytes
+
+    def batch_shapes(self, batch_size):
+        return TransitionTable.batch_shapes(self, batch_size) + [((batch_size, 1), np.float32), ((batch_size,), np.int64)]
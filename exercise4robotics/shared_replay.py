@@ -0,0 +1,243 @@
+import numpy as np
+import multiprocessing as mp
+import time
+# custom modules
+from utils             import cast_frames, FrameHistory
+from simulator         import Simulator
+from atlas             import ObsAtlas
+from subproc_simulator import shared_array
+
+# control block layout
+RESERVED  = 0 # #slots handed out to writers so far
+COMMITTED = 1 # #transitions fully written so far
+STOP      = 2 # set to 1 to stop the actors
+VERSION   = 3 # params version, odd while the learner writes new params
+ctrl_siz  = 4
+
+class SharedTransitionTable:
+
+    # replay memory in shared memory that several actor processes add to while one learner samples from it
+    # NOTE: a writer only holds the lock to reserve its slot (to bump a counter), the copying is done
+    # NOTE: w/o it, each slot has a stamp that is 0 while it is written & its reservation number + 1 after,
+    # NOTE: so the learner (which never takes the lock) drops rows whose stamp was 0 or changed while
+    # NOTE: it copied them & draws new ones instead
+    # NOTE: create it before forking the actors (they inherit the shared memory), close() it in the learner
+
+    # basic funcs
+
+    def __init__(self, state_siz, act_num, hist_len, minibatch_size, max_transitions, store_dtype="float32"):
+        self.state_siz = state_siz
+        self.act_num = act_num
+        self.hist_len  = hist_len
+        self.batch_size = minibatch_size
+        self.max_transitions = max_transitions
+        self.store_dtype = np.dtype(store_dtype)
+        self.closed = True
+        self.shms = []
+        self.states  = self.alloc((max_transitions, state_siz*hist_len), self.store_dtype)
+        self.actions = self.alloc((max_transitions,), np.int8)
+        self.next_states = self.alloc((max_transitions, state_siz*hist_len), self.store_dtype)
+        self.rewards = self.alloc((max_transitions, 1), np.float32)
+        self.terminal = self.alloc((max_transitions, 1), bool)
+        self.stamps  = self.alloc((max_transitions,), np.int64)
+        self.ctrl    = self.alloc((ctrl_siz,), np.int64)
+        self.lock = mp.get_context("fork").Lock()
+        self.closed = False
+
+    def __del__(self):
+        self.close()
+
+    # helper funcs
+
+    def alloc(self, shape, dtype):
+        shm, array = shared_array(shape, dtype)
+        array[...] = 0
+        self.shms.append(shm)
+        return array
+
+    @property
+    def size(self): # #transitions that can be sampled
+        return int(min(self.ctrl[COMMITTED], self.max_transitions))
+
+    def one_hot_action(self, actions):
+        actions = np.asarray(actions, dtype=int).reshape(-1)
+        one_hot_actions = np.zeros((actions.shape[0], self.act_num), dtype=np.float32)
+        one_hot_actions[np.arange(actions.shape[0]), actions] = 1
+        return one_hot_actions
+
+    def nbytes(self): # shared memory held by the table
+        return sum(shm.size for shm in self.shms)
+
+    # core funcs
+
+    def add(self, state, action, next_state, reward, terminal): # action: index (or one hot vector)
+        if np.ndim(action) > 0:
+            action = np.argmax(action)
+        with self.lock:
+            reserved = int(self.ctrl[RESERVED])
+            self.ctrl[RESERVED] = reserved + 1
+        slot = reserved % self.max_transitions
+        self.stamps[slot] = 0 # invalid until written
+        self.states[slot] = cast_frames(state, self.store_dtype)
+        self.actions[slot] = action
+        self.next_states[slot] = cast_frames(next_state, self.store_dtype)
+        self.rewards[slot] = reward
+        self.terminal[slot] = terminal
+        self.stamps[slot] = reserved + 1
+        with self.lock:
+            self.ctrl[COMMITTED] += 1
+
+    def sample_minibatch(self, batch_size=None):
+        # same as TransitionTable.sample_minibatch, only reads the shared memory (never waits for the actors)
+        if batch_size is None:
+            batch_size = self.batch_size
+        assert self.size > 0, "cannot sample from an empty SharedTransitionTable"
+        state      = np.zeros((batch_size, self.state_siz*self.hist_len), dtype=np.float32)
+        action     = np.zeros(batch_size, dtype=np.int8)
+        next_state = np.zeros((batch_size, self.state_siz*self.hist_len), dtype=np.float32)
+        reward     = np.zeros((batch_size, 1), dtype=np.float32)
+        terminal   = np.zeros((batch_size, 1), dtype=np.float32)
+        rows = np.arange(batch_size) # rows still to be drawn
+        while rows.shape[0] > 0:
+            num_slot = min(int(self.ctrl[RESERVED]), self.max_transitions)
+            index = np.random.randint(0, num_slot, rows.shape[0])
+            stamp = self.stamps[index]
+            state[rows]      = self.states[index]
+            action[rows]     = self.actions[index]
+            next_state[rows] = self.next_states[index]
+            reward[rows]     = self.rewards[index]
+            terminal[rows]   = self.terminal[index]
+            rows = rows[(stamp == 0) | (self.stamps[index] != stamp)]
+        return state, self.one_hot_action(action), next_state, reward, terminal
+
+    def close(self):
+        if getattr(self, "closed", True):
+            return
+        self.closed = True
+        # drop our views before releasing the shared memory
+        self.states = self.actions = self.next_states = self.rewards = self.terminal = None
+        self.stamps = self.ctrl = None
+        for shm in self.shms:
+            try:
+                shm.close()
+            except BufferError: # the caller still holds views, the memory is freed once they are gone
+                pass
+            shm.unlink()
+        self.shms = []
+
+
+def linear_q(params, states):
+    # Q values of a linear policy on the states scaled to [0, 1], params: (state_len + 1) x act_num, flat
+    weights = params.reshape(states.shape[1] + 1, -1)
+    return (states / 255.).dot(weights[:-1]) + weights[-1]
+
+def actor(actor_ind, opt, trans, q_fn, params, epsilon, seed):
+    # runs its own Simulator w/ an epsilon greedy policy on the latest params & adds every transition to trans
+    np.random.seed(seed)
+    sim = Simulator(opt.map_ind, opt.cub_siz, opt.pob_siz, opt.act_num, opt.obs_mode, seed)
+    atlas = ObsAtlas(opt.map_ind, opt.cub_siz, opt.pob_siz, obs_mode=opt.obs_mode)
+    policy = np.zeros_like(params)
+    version = -1
+    epi_step = 0
+    state = sim.newGame(opt.tgt_y, opt.tgt_x)
+    hist = FrameHistory(opt.hist_len, opt.state_siz)
+    hist.reset(atlas.lookup_sim(sim)[1])
+    try:
+        while trans.ctrl[STOP] == 0:
+            if state.terminal or epi_step >= opt.early_stop:
+                epi_step = 0
+                state = sim.newGame(opt.tgt_y, opt.tgt_x)
+                hist.reset(atlas.lookup_sim(sim)[1])
+            # take a snapshot of new params (only if the learner was not writing them meanwhile)
+            new_version = int(trans.ctrl[VERSION])
+            if new_version != version and new_version % 2 == 0:
+                policy[:] = params
+                if trans.ctrl[VERSION] == new_version:
+                    version = new_version
+            if np.random.rand() < epsilon[actor_ind]:
+                action = np.random.randint(opt.act_num)
+            else:
+                action = int(np.argmax(q_fn(policy, hist.get().reshape(1, -1))))
+            state = sim.step(action)
+            hist.push(atlas.lookup_sim(sim)[1])
+            trans.add(hist.get_prev(), action, hist.get(), state.reward, state.terminal)
+            epi_step += 1
+    except KeyboardInterrupt:
+        pass
+
+
+class ActorPool:
+
+    # num_actor actor processes (see actor()) that fill trans while the learner trains in this process
+    # the learner hands its current params over w/ publish() (they go into shared memory, the actors
+    # pick them up before their next step), so neither side ever waits for the other:
+    #     pool = ActorPool(opt, trans, linear_q, params, num_actor=4)
+    #     while training:
+    #         batch = trans.sample_minibatch()
+    #         ... update params ...
+    #         pool.publish(params)
+    #     pool.close()
+    # NOTE: q_fn(params, states) -> Q values runs in the actors, so it must only use numpy & params
+    # NOTE: each actor has its own epsilon (see set_epsilon()), e.g. spread out like in Ape-X
+
+    def __init__(self, opt, trans, q_fn, params, num_actor, epsilon=0.1, seed=None):
+        self.trans = trans
+        self.num_actor = num_actor
+        self.closed = True
+        self.shms = []
+        self.params = self.alloc(np.shape(params), np.float32)
+        self.epsilon = self.alloc((num_actor,), np.float64)
+        self.publish(params)
+        self.set_epsilon(epsilon)
+        if seed is None:
+            seed = np.random.randint(2**31 - num_actor)
+        trans.ctrl[STOP] = 0
+        ctx = mp.get_context("fork")
+        self.procs = []
+        for i in range(num_actor):
+            proc = ctx.Process(target=actor, args=(i, opt, trans, q_fn, self.params, self.epsilon, seed + i))
+            proc.daemon = True # actors die w/ the main process
+            proc.start()
+            self.procs.append(proc)
+        self.closed = False
+
+    def __del__(self):
+        self.close()
+
+    def alloc(self, shape, dtype):
+        shm, array = shared_array(shape, dtype)
+        self.shms.append(shm)
+        return array
+
+    def publish(self, params): # new params for the actors' policy
+        self.trans.ctrl[VERSION] += 1
+        self.params[:] = params
+        self.trans.ctrl[VERSION] += 1
+
+    def set_epsilon(self, epsilon): # one value for all actors or one per actor
+        self.epsilon[:] = epsilon
+
+    def steps(self): # #transitions the actors added so far
+        return int(self.trans.ctrl[COMMITTED])
+
+    def wait_for(self, size, poll=0.01): # e.g. to wait until the replay memory is warmed up
+        while self.trans.size < size:
+            time.sleep(poll)
+
+    def close(self):
+        if getattr(self, "closed", True):
+            return
+        self.closed = True
+        self.trans.ctrl[STOP] = 1
+        for proc in self.procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        self.params = self.epsilon = None
+        for shm in self.shms:
+            try:
+                shm.close()
+            except BufferError:
+                pass
+            shm.unlink()
+        self.shms = []
@@ -0,0 +1,155 @@
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+# custom modules
+from simulator import VecSimulator
+
+def shared_array(shape, dtype): # numpy array backed by a new shared memory block
+    shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize))
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def worker(remote, parent_remote, env_lo, env_hi, seed, sim_args, buffers):
+    # runs a VecSimulator for envs [env_lo, env_hi) and writes its results into the shared buffers
+    parent_remote.close()
+    np.random.seed(seed)
+    actions, pobs, rewards, terminals = buffers
+    vsim = VecSimulator(*sim_args)
+    try:
+        while True:
+            cmd, data = remote.recv()
+            if cmd == "step":
+                slot = data
+                pob, reward, terminal = vsim.step(actions[env_lo:env_hi])
+            elif cmd == "new":
+                slot, tgt_y, tgt_x = data
+                pob, reward, terminal = vsim.newGame(tgt_y, tgt_x)
+            elif cmd == "close":
+                break
+            pobs[slot, env_lo:env_hi] = pob
+            rewards[slot, env_lo:env_hi] = reward
+            terminals[slot, env_lo:env_hi] = terminal
+            remote.send(slot)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        remote.close()
+
+
+class SubprocVecSimulator:
+
+    # num_worker processes, each stepping env_per_worker envs w/ its own VecSimulator
+    # NOTE: results are written into a ring of num_slot shared memory buffers instead of being pickled,
+    # NOTE: the arrays returned by step_wait() are views into the ring and stay valid for the next
+    # NOTE: num_slot - 1 steps (copy them if you need them for longer)
+    # NOTE: step_async() returns right away, so the caller can train while the workers step:
+    #     vsim.step_async(actions)
+    #     ... update the network ...
+    #     pob, reward, terminal = vsim.step_wait()
+
+    # basic funcs
+
+    def __init__(self, map_ind, cub_siz, pob_siz, act_num, num_worker, env_per_worker,
+                       early_stop=None, obs_mode="pixel", num_slot=2, seed=None):
+        self.num_worker = num_worker
+        self.num_env = num_worker * env_per_worker
+        self.num_slot = num_slot
+        self.slot = 0
+        self.waiting = False
+        pob_len = pob_siz * (1 if obs_mode == "grid" else cub_siz)
+        # shared buffers
+        self.closed = True # nothing to shut down until the workers are up
+        self.shms = []
+        self.actions   = self.alloc((self.num_env,), np.int64)
+        self.pobs      = self.alloc((num_slot, self.num_env, pob_len, pob_len, 3), np.uint8)
+        self.rewards   = self.alloc((num_slot, self.num_env), np.float64)
+        self.terminals = self.alloc((num_slot, self.num_env), bool)
+        buffers = (self.actions, self.pobs, self.rewards, self.terminals)
+        # workers
+        if seed is None:
+            seed = np.random.randint(2**31 - num_worker)
+        ctx = mp.get_context("fork")
+        self.remotes, self.procs = [], []
+        for i in range(num_worker):
+            remote, work_remote = ctx.Pipe()
+            sim_args = (map_ind, cub_siz, pob_siz, act_num, env_per_worker, early_stop, True, obs_mode, seed + i)
+            proc = ctx.Process(target=worker,
+                               args=(work_remote, remote, i * env_per_worker, (i + 1) * env_per_worker,
+                                     seed + i, sim_args, buffers))
+            proc.daemon = True # workers die w/ the main process
+            proc.start()
+            work_remote.close()
+            self.remotes.append(remote)
+            self.procs.append(proc)
+        self.closed = False
+
+    def __del__(self):
+        self.close()
+
+    # helper funcs
+
+    def alloc(self, shape, dtype):
+        shm, array = shared_array(shape, dtype)
+        self.shms.append(shm)
+        return array
+
+    def get_state(self, slot):
+        return self.pobs[slot], self.rewards[slot], self.terminals[slot]
+
+    # interfacing funcs
+
+    def newGame(self, tgt_y, tgt_x):
+        assert not self.waiting
+        self.slot = (self.slot + 1) % self.num_slot
+        for remote in self.remotes:
+            remote.send(("new", (self.slot, tgt_y, tgt_x)))
+        for remote in self.remotes:
+            remote.recv()
+        return self.get_state(self.slot)
+
+    def step_async(self, actions):
+        assert not self.waiting
+        self.actions[:] = actions
+        self.slot = (self.slot + 1) % self.num_slot
+        for remote in self.remotes:
+            remote.send(("step", self.slot))
+        self.waiting = True
+
+    def step_wait(self):
+        assert self.waiting
+        for remote in self.remotes:
+            remote.recv()
+        self.waiting = False
+        return self.get_state(self.slot)
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        if getattr(self, "closed", True):
+            return
+        self.closed = True
+        if self.waiting:
+            for remote in self.remotes:
+                remote.recv()
+            self.waiting = False
+        for remote in self.remotes:
+            try:
+                remote.send(("close", None))
+            except (BrokenPipeError, EOFError):
+                pass
+        for proc in self.procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        for remote in self.remotes:
+            remote.close()
+        # drop our views before releasing the shared memory
+        self.actions = self.pobs = self.rewards = self.terminals = None
+        for shm in self.shms:
+            try:
+                shm.close()
+            except BufferError: # the caller still holds views, the memory is freed once they are gone
+                pass
+            shm.unlink()
+        self.shms = []
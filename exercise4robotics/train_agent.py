@@ -7,9 +7,11 @@ from random import randrange
 import tensorflow as tf
 
 # custom modules
-from utils     import Options, rgb2gray
+from utils     import Options, FrameHistory
 from simulator import Simulator
-from transitionTable import TransitionTable
+from transitionTable import TransitionTable, FrameTransitionTable
+from prioritized_replay import PrioritizedTransitionTable
+from atlas     import ObsAtlas
 
 
 #!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
@@ -19,7 +21,7 @@ from transitionTable import TransitionTable
 # you can copy this into your agent class or use it from here
 #!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
 
-def Q_loss(Q_s, action_onehot, Q_s_next, best_action_next, reward, terminal, discount=0.99):
+def Q_loss(Q_s, action_onehot, Q_s_next, best_action_next, reward, terminal, discount=0.99, weights=None):
     """
     All inputs should be tensorflow variables!
     We use the following notation:
@@ -37,7 +39,22 @@ def Q_loss(Q_s, action_onehot, Q_s_next, best_action_next, reward, terminal, dis
        best_action_next: a NxA matrix with the best current action for the next state
        reward: a Nx1 matrix containing the reward for the transition
        terminal: a Nx1 matrix indicating whether the next state was a terminal state
-       discount: the discount factor
+       discount: the discount factor (or a Nx1 matrix of per sample discounts, e.g. the discount^n
+                 of n step transitions as returned by sample_minibatch when the table has n_step > 1)
+    Optional inputs:
+       weights: a Nx1 matrix of importance sampling weights for the squared errors
+                (as returned by PrioritizedTransitionTable.sample_minibatch)
+    """
+    td_error = Q_td_error(Q_s, action_onehot, Q_s_next, best_action_next, reward, terminal, discount)
+    if weights is None:
+        return tf.reduce_sum(tf.square(td_error))
+    return tf.reduce_sum(weights * tf.square(td_error))
+
+def Q_td_error(Q_s, action_onehot, Q_s_next, best_action_next, reward, terminal, discount=0.99):
+    """
+    The Nx1 matrix of TD errors Q(s, a) - (reward + discount * Q(s', a*)) that Q_loss squares,
+    takes the same inputs as Q_loss. Fetch it together w/ your training op and pass it to
+    PrioritizedTransitionTable.update_priorities to prioritize the transitions by it.
     """
     # calculate: reward + discount * Q(s', a*),
     # where a* = arg max_a Q(s', a) is the best action for s' (the next state)
@@ -47,16 +64,48 @@ def Q_loss(Q_s, action_onehot, Q_s_next, best_action_next, reward, terminal, dis
     target_q = tf.stop_gradient(target_q)
     # calculate: Q(s, a) where a is simply the action taken to get from s to s'
     selected_q = tf.reduce_sum(action_onehot * Q_s, 1, keep_dims=True)
-    loss = tf.reduce_sum(tf.square(selected_q - target_q))    
-    return loss
+    return selected_q - target_q
 
-def append_to_hist(state, obs):
+def Q_update(network, x, u, xn, r, term, discount=0.99, weights=None, target_network=None, double_q=False):
     """
-    Add observation to the state.
+    Builds the whole Q learning update in one graph, so that a single sess.run per update is enough:
+    the network runs only once (on the concatenated [x; xn] when it also has to judge the next states)
+    and the best next action is taken in-graph (instead of a separate run to compute best_action_next
+    & feeding it back in).
+    Required inputs:
+       network: a function that maps a NxS tensor of states to the NxA Q values (your forward pass),
+                it is called once (on 2N states, or on the N states x w/ a target_network w/o double_q)
+       x, u, xn, r, term: the placeholders for states, one hot actions, next states, rewards and terminals
+                          (as in the sketch below / the inputs of Q_loss)
+    Optional inputs:
+       discount, weights: as for Q_loss
+       target_network: a function like network for the target network (e.g. the same forward pass on a
+                       second set of variables), Q(s', a*) is then taken from it
+       double_q: double DQN, a* = arg max_a Q(s', a) is chosen by network and evaluated by target_network
+    Returns:
+       the loss and the Nx1 TD errors (see Q_td_error)
+    NOTE: the network then sees the 2N states as one batch, mind that when it normalizes over the batch
     """
-    for i in range(state.shape[0]-1):
-        state[i, :] = state[i+1, :]
-    state[-1, :] = obs
+    assert target_network is not None or not double_q, "double_q needs a target_network"
+    if target_network is not None and not double_q:
+        # the target net picks & evaluates a*, the online net only needs Q(s, .)
+        Q_s = network(x)
+        Q_s_next = target_network(xn)
+        best_action_next = tf.one_hot(tf.argmax(Q_s_next, 1), tf.shape(Q_s)[1], dtype=Q_s.dtype)
+    else:
+        n = tf.shape(x)[0]
+        Q_all = network(tf.concat([x, xn], 0))
+        Q_s = Q_all[:n]
+        Q_s_next = Q_all[n:]
+        # the online net picks a*, w/ double DQN the target net evaluates it
+        best_action_next = tf.one_hot(tf.argmax(Q_s_next, 1), tf.shape(Q_s)[1], dtype=Q_s.dtype)
+        if double_q:
+            Q_s_next = target_network(xn)
+    # Q_td_error stops the gradient through the target
+    td_error = Q_td_error(Q_s, u, Q_s_next, best_action_next, r, term, discount)
+    if weights is None:
+        return tf.reduce_sum(tf.square(td_error)), td_error
+    return tf.reduce_sum(weights * tf.square(td_error)), td_error
 
 #!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
 # NOTE:
@@ -68,11 +117,38 @@ def append_to_hist(state, obs):
 
 # 0. initialization
 opt = Options()
-sim = Simulator(opt.map_ind, opt.cub_siz, opt.pob_siz, opt.act_num)
+sim = Simulator(opt.map_ind, opt.cub_siz, opt.pob_siz, opt.act_num, opt.obs_mode)
+# NOTE: to collect experience faster you can step many envs at once w/ VecSimulator (simulator.py)
+# NOTE: or in worker processes w/ SubprocVecSimulator (subproc_simulator.py), whose
+# NOTE: step_async() / step_wait() let you update the network while the envs are being stepped
+# NOTE: (trans.add_batch() adds the transitions of all envs of a step at once & BatchFrameHistory
+# NOTE: in utils.py keeps the histories of all envs)
+# NOTE: or let actor processes fill a SharedTransitionTable while you train, see train_async.py
+# NOTE: likewise trans.iterate_minibatches() builds the minibatches in a background thread,
+# NOTE: use next() on it instead of trans.sample_minibatch() once the table holds some transitions
 # setup a large transitiontable that is filled during training
 maxlen = 100000
-trans = TransitionTable(opt.state_siz, opt.act_num, opt.hist_len,
-                        opt.minibatch_size, maxlen)
+# the replay options that do not go together
+assert not (opt.replay_prio and opt.replay_frames), \
+    "opt.replay_prio & opt.replay_frames cannot be combined (PrioritizedTransitionTable stores whole states)"
+assert not (opt.replay_frames and opt.n_step > 1), \
+    "opt.n_step > 1 is not supported w/ opt.replay_frames (FrameTransitionTable stores 1 step transitions only)"
+assert not (opt.replay_frames and opt.replay_dir is not None), \
+    "opt.replay_dir is not supported w/ opt.replay_frames (FrameTransitionTable is kept in memory only)"
+if opt.replay_prio:
+    trans = PrioritizedTransitionTable(opt.state_siz, opt.act_num, opt.hist_len,
+                                       opt.minibatch_size, maxlen, opt.store_dtype,
+                                       opt.prio_alpha, opt.prio_beta, replay_dir=opt.replay_dir,
+                                       n_step=opt.n_step, discount=opt.discount)
+elif opt.replay_frames:
+    trans = FrameTransitionTable(opt.state_siz, opt.act_num, opt.hist_len,
+                                 opt.minibatch_size, maxlen, opt.store_dtype)
+else:
+    trans = TransitionTable(opt.state_siz, opt.act_num, opt.hist_len,
+                            opt.minibatch_size, maxlen, opt.store_dtype, opt.replay_dir,
+                            n_step=opt.n_step, discount=opt.discount)
+# pob lookup table, atlas.lookup_sim(sim)[1] is rgb2gray(state.pob) w/o rendering
+atlas = ObsAtlas(opt.map_ind, opt.cub_siz, opt.pob_siz, obs_mode=opt.obs_mode)
 
 if opt.disp_on:
     win_all = None
@@ -99,6 +175,18 @@ Qn =  my_network_forward_pass(xn)
 
 # calculate the loss
 loss = Q_loss(Q, u, Qn, ustar, r, term)
+# w/ n step returns (opt.n_step > 1) feed the per sample discounts as well
+# disc = tf.placeholder(tf.float32, shape=(opt.minibatch_size, 1))
+# loss = Q_loss(Q, u, Qn, ustar, r, term, discount=disc)
+# w/ prioritized replay (opt.replay_prio) weight the loss & keep the TD errors for the new priorities
+# w = tf.placeholder(tf.float32, shape=(opt.minibatch_size, 1))
+# loss = Q_loss(Q, u, Qn, ustar, r, term, weights=w)
+# td_error = Q_td_error(Q, u, Qn, ustar, r, term)
+# or all of the above in one graph w/ a single forward pass & no ustar to compute / feed (see Q_update)
+# loss, td_error = Q_update(my_network_forward_pass, x, u, xn, r, term)
+# w/ a target network (double DQN: double_q=True), update its variables every once in a while
+# loss, td_error = Q_update(my_network_forward_pass, x, u, xn, r, term,
+#                           target_network=my_target_network_forward_pass, double_q=True)
 
 # setup an optimizer in tensorflow to minimize the loss
 """
@@ -110,9 +198,9 @@ epi_step = 0
 nepisodes = 0
 
 state = sim.newGame(opt.tgt_y, opt.tgt_x)
-state_with_history = np.zeros((opt.hist_len, opt.state_siz))
-append_to_hist(state_with_history, rgb2gray(state.pob).reshape(opt.state_siz))
-next_state_with_history = np.copy(state_with_history)
+# the last hist_len frames, hist.get() is the current state w/ history (the input to your network)
+hist = FrameHistory(opt.hist_len, opt.state_siz)
+hist.reset(atlas.lookup_sim(sim)[1])
 for step in xrange(steps):
     if state.terminal or epi_step >= opt.early_stop:
         epi_step = 0
@@ -120,28 +208,33 @@ for step in xrange(steps):
         # reset the game
         state = sim.newGame(opt.tgt_y, opt.tgt_x)
         # and reset the history
-        state_with_history[:] = 0
-        append_to_hist(state_with_history, rgb2gray(state.pob).reshape(opt.state_siz))
-        next_state_with_history = np.copy(state_with_history)
+        hist.reset(atlas.lookup_sim(sim)[1])
     #!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
     # TODO: here you would let your agent take its action
     #       remember
     #!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
     # this just gets a random action
     action = randrange(opt.act_num)
-    action_onehot = trans.one_hot_action(action)
     next_state = sim.step(action)
     # append to history
-    append_to_hist(next_state_with_history, rgb2gray(next_state.pob).reshape(opt.state_siz))
-    # add to the transition table
-    trans.add(state_with_history.reshape(-1), action_onehot, next_state_with_history.reshape(-1), next_state.reward, next_state.terminal)
+    hist.push(atlas.lookup_sim(sim)[1])
+    # add to the transition table (the state before the push & the next state after it)
+    trans.add(hist.get_prev(), action, hist.get(), next_state.reward, next_state.terminal)
+    if opt.replay_dir is not None and (step + 1) % opt.snapshot_freq == 0:
+        trans.snapshot() # a restarted run resumes w/ the transitions up to here
     # mark next state as current state
-    state_with_history = np.copy(next_state_with_history)
     state = next_state
     #!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
     # TODO: here you would train your agent
     #!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
-    state_batch, action_batch, next_state_batch, reward_batch, terminal_batch = trans.sample_minibatch()
+    # only sample once the table holds transitions (w/ opt.n_step > 1 the first ones stay pending for n - 1 steps)
+    if trans.size > 0:
+        batch = trans.sample_minibatch()
+        state_batch, action_batch, next_state_batch, reward_batch, terminal_batch = batch[:5]
+        if opt.n_step > 1: # reward_batch holds the n step returns & next_state_batch the states n steps ahead
+            discount_batch = batch[5]
+        if opt.replay_prio:
+            weight_batch, index_batch = batch[-2:]
     # TODO train me here
     # this should proceed as follows:
     # 1) pre-define variables and networks as outlined above
@@ -151,9 +244,26 @@ for step in xrange(steps):
     # 2) with that action make an update to the q values
     #    as an example this is how you could print the loss 
     #print(sess.run(loss, feed_dict = {x : state_batch, u : action_batch, ustar : action_batch_next, xn : next_state_batch, r : reward_batch, term : terminal_batch}))
+    #    w/ Q_update there is no action_batch_next to calculate, one run does it all
+    #print(sess.run(loss, feed_dict = {x : state_batch, u : action_batch, xn : next_state_batch, r : reward_batch, term : terminal_batch}))
+    #    w/ prioritized replay fetch td_error w/ your training op (feeding w : weight_batch) and pass it back:
+    #trans.update_priorities(index_batch, td_error_batch)
 
     
     # TODO every once in a while you should test your agent here so that you can track its performance
+    # w/o stalling the training: let an AsyncEvaluator (async_eval.py) run the test episodes in the
+    # background on a snapshot of your weights, e.g. created before the loop as
+    # from async_eval import AsyncEvaluator
+    # evaluator = AsyncEvaluator(opt, my_numpy_q_fn, opt.eval_nepisodes)
+    # where my_numpy_q_fn(params, states) does the forward pass of your network in numpy
+    #if (step + 1) % opt.eval_freq == 0:
+    #    evaluator.submit(step + 1, sess.run(my_network_weights))
+    #for eval_step, result in evaluator.poll():
+    #    print(eval_step, result["success_rate"], result["mean_steps"])
+    # or w/o any episodes: compare your Q values to the exact ones of value_iteration.py, e.g.
+    # from value_iteration import ValueIteration
+    # vi = ValueIteration(opt.map_ind, opt.act_num, opt.discount, tgt_pos=[(opt.tgt_y, opt.tgt_x)]) before the loop and
+    #print(vi.score_q_fn(lambda states: sess.run(Q, feed_dict = {x : states}), atlas, opt.hist_len))
 
     if opt.disp_on:
         if win_all is None:
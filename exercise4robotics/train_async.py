@@ -0,0 +1,47 @@
+import numpy as np
+import time
+# custom modules
+from utils         import Options
+from shared_replay import SharedTransitionTable, ActorPool, linear_q
+
+# actor / learner version of train_agent.py: num_actor processes act w/ their own Simulator &
+# fill a replay memory in shared memory while this process (the learner) keeps sampling
+# minibatches & updating the policy, as an example w/ a linear Q function trained by numpy SGD
+# NOTE: swap linear_q & the update for your network, the actors only need a numpy forward pass
+
+opt = Options()
+maxlen = 100000
+num_actor = 4
+train_time = 20 # seconds
+learning_rate = 1e-3
+discount = 0.99
+
+trans = SharedTransitionTable(opt.state_siz, opt.act_num, opt.hist_len, opt.minibatch_size, maxlen, opt.store_dtype)
+state_len = opt.state_siz * opt.hist_len
+params = np.zeros((state_len + 1) * opt.act_num, dtype=np.float32)
+# each actor explores w/ its own epsilon between 0.4 and 0.4^8
+epsilon = 0.4 ** (1 + 7 * np.arange(num_actor) / float(max(num_actor - 1, 1)))
+pool = ActorPool(opt, trans, linear_q, params, num_actor, epsilon)
+pool.wait_for(opt.minibatch_size)
+
+updates = 0
+start = time.time()
+while time.time() - start < train_time:
+    state_batch, action_batch, next_state_batch, reward_batch, terminal_batch = trans.sample_minibatch()
+    # one SGD step on the squared TD error (see Q_loss in train_agent.py)
+    q_next = linear_q(params, next_state_batch)
+    target_q = reward_batch[:, 0] + (1. - terminal_batch[:, 0]) * discount * q_next.max(1)
+    td_error = np.sum(linear_q(params, state_batch) * action_batch, 1) - target_q
+    grad = td_error[:, None] * action_batch # dloss / dQ
+    weights = params.reshape(state_len + 1, opt.act_num)
+    weights[:-1] -= learning_rate * (state_batch / 255.).T.dot(grad) / opt.minibatch_size
+    weights[-1]  -= learning_rate * grad.mean(0)
+    pool.publish(params)
+    updates += 1
+    if updates % 1000 == 0:
+        print("%6d updates, %7d transitions, td error %.4f" % (updates, pool.steps(), np.abs(td_error).mean()))
+
+elapsed = time.time() - start
+print("learner: %.0f updates/s, actors: %.0f steps/s" % (updates / elapsed, pool.steps() / elapsed))
+pool.close()
+trans.close()
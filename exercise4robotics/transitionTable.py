@@ -1,60 +1,354 @@
 import numpy as np
+import threading
+import json
+import os
+# custom modules
+from utils    import cast_frames
+from prefetch import MinibatchPrefetcher
+
+meta_fil = "meta.json"
 
 class TransitionTable:
 
+    # NOTE: w/ a replay_dir the arrays are np.memmap files in that directory (so the capacity is
+    # NOTE: limited by the disk instead of the RAM) & a table created on an existing replay_dir resumes
+    # NOTE: from its last snapshot(), which persists top / bottom / size in meta.json
+    # NOTE: transitions of the last snapshot are only overwritten after they were dropped from meta.json
+    # NOTE: (release_chunk at a time), so after a crash the directory always holds a consistent table
+    # NOTE: w/ n_step > 1 each transition is stored w/ the discounted return of the next n_step rewards
+    # NOTE: (fewer at the end of an episode), the state n_step steps ahead as next_state (to bootstrap from)
+    # NOTE: & its discount^#steps, which sample_minibatch() then returns as an additional Nx1 discount
+    # NOTE: the last n_step - 1 transitions are held back until their return is complete, an episode that
+    # NOTE: ends w/o a terminal (e.g. early_stop) is complete once the next added state does not continue it
+
     # basic funcs
 
     def __init__(self, state_siz, act_num, hist_len,
-                       minibatch_size, max_transitions):
+                       minibatch_size, max_transitions, store_dtype="float32",
+                       replay_dir=None, release_chunk=1024, n_step=1, discount=0.99):
         self.state_siz = state_siz
         self.act_num = act_num
         self.hist_len  = hist_len
         self.batch_size = minibatch_size
         self.max_transitions = max_transitions
+        self.store_dtype = np.dtype(store_dtype)
+        self.n_step = n_step
+        self.discount = discount
+        self.pending = {} # env: (transitions whose n step return is not complete yet, their latest next_state)
+        self.replay_dir = replay_dir
+        self.release_chunk = release_chunk
+        self.top = 0
+        self.bottom = 0
+        self.size = 0
+        resume = replay_dir is not None and os.path.exists(os.path.join(replay_dir, meta_fil))
+        if resume:
+            self.load_meta()
+        elif replay_dir is not None and not os.path.isdir(replay_dir):
+            os.makedirs(replay_dir)
 
         # memory for state transitions
-        self.states  = np.zeros((max_transitions, state_siz*hist_len))
-        self.actions = np.zeros((max_transitions, act_num))
-        self.next_states = np.zeros((max_transitions, state_siz*hist_len))
-        self.rewards = np.zeros((max_transitions, 1))
-        self.terminal = np.zeros((max_transitions, 1))
+        # NOTE: states are kept as store_dtype (float64, float32, float16 or uint8 w/ rounded values),
+        # NOTE: actions as int8 indices & terminals as bools, only sampled minibatches are float32 & one hot
+        self.states  = self.alloc("states", (max_transitions, state_siz*hist_len), self.store_dtype, resume)
+        self.actions = self.alloc("actions", (max_transitions,), np.int8, resume)
+        self.next_states = self.alloc("next_states", (max_transitions, state_siz*hist_len), self.store_dtype, resume)
+        self.rewards = self.alloc("rewards", (max_transitions, 1), np.float32, resume)
+        self.terminal = self.alloc("terminal", (max_transitions, 1), bool, resume)
+        self.discounts = self.alloc("discounts", (max_transitions, 1), np.float32, resume)
+        self.lock = threading.RLock() # guards against minibatches being built while a transition is added
+        self.mark_snapshot()
+        if replay_dir is not None and not resume:
+            self.write_meta(self.top, self.bottom, self.size)
+
+    # helper funcs
+
+    def alloc(self, name, shape, dtype, resume):
+        if self.replay_dir is None:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.replay_dir, name + ".bin"), dtype=dtype,
+                         mode="r+" if resume else "w+", shape=shape)
+
+    def config(self):
+        return {"state_siz": self.state_siz,
+                "act_num": self.act_num,
+                "hist_len": self.hist_len,
+                "max_transitions": self.max_transitions,
+                "store_dtype": self.store_dtype.name}
+
+    def load_meta(self):
+        with open(os.path.join(self.replay_dir, meta_fil)) as f:
+            meta = json.load(f)
+        for key, value in self.config().items():
+            assert meta[key] == value, "%s holds a table w/ %s %s, not %s" % (self.replay_dir, key, meta[key], value)
+        self.top, self.bottom, self.size = meta["top"], meta["bottom"], meta["size"]
+
+    def write_meta(self, top, bottom, size):
+        meta = dict(self.config(), version=1, top=top, bottom=bottom, size=size)
+        tmp_fil = os.path.join(self.replay_dir, meta_fil + ".tmp")
+        with open(tmp_fil, "w") as f:
+            json.dump(meta, f, indent=1)
+        os.replace(tmp_fil, os.path.join(self.replay_dir, meta_fil))
+
+    def mark_snapshot(self):
+        self.snap_top, self.snap_bottom, self.snap_size = self.top, self.bottom, self.size
+        self.written = 0  # #slots written since the snapshot
+        self.released = 0 # #oldest snapshot transitions dropped from meta.json since
+
+    def release(self, n):
+        # before n more slots are written: drop the snapshot transitions they overwrite from meta.json
+        if self.replay_dir is None:
+            return
+        self.written += n
+        overwritten = self.written - (self.max_transitions - self.snap_size)
+        if overwritten > self.released:
+            self.released = min(overwritten + self.release_chunk, self.snap_size)
+            self.write_meta(self.snap_top, (self.snap_bottom + self.released) % self.max_transitions,
+                            self.snap_size - self.released)
+
+    def put(self, state, action, next_state, reward, terminal, discount):
+        # writes one transition at top
+        with self.lock:
+            self.release(1)
+            self.states[self.top] = cast_frames(state, self.store_dtype)
+            self.actions[self.top] = action
+            self.next_states[self.top] = cast_frames(next_state, self.store_dtype)
+            self.rewards[self.top] = reward
+            self.terminal[self.top] = terminal
+            self.discounts[self.top] = discount
+            if self.size == self.max_transitions:
+                self.bottom = (self.bottom + 1) % self.max_transitions
+            else:
+                self.size += 1
+            self.top = (self.top + 1) % self.max_transitions
+
+    def put_pending(self, env, terminal):
+        # stores the oldest pending transition of env w/ the return of all pending rewards
+        transitions, next_state = self.pending[env]
+        state, action, _ = transitions[0]
+        rewards = np.array([reward for _, _, reward in transitions])
+        ret = np.sum(rewards * self.discount ** np.arange(rewards.shape[0]))
+        self.put(state, action, next_state, ret, terminal, self.discount ** rewards.shape[0])
+        del transitions[0]
+
+    def add_n_step(self, env, state, action, next_state, reward, terminal):
+        state = cast_frames(state, self.store_dtype).copy()
+        if env in self.pending and not np.array_equal(state, self.pending[env][1]):
+            # the previous episode ended w/o a terminal, bootstrap its last transitions from its last state
+            while self.pending[env][0]:
+                self.put_pending(env, False)
+        transitions = self.pending[env][0] if env in self.pending else []
+        transitions.append((state, action, reward))
+        self.pending[env] = (transitions, cast_frames(next_state, self.store_dtype).copy())
+        if terminal:
+            while transitions:
+                self.put_pending(env, True)
+        elif len(transitions) == self.n_step:
+            self.put_pending(env, False)
+
+    def add(self, state, action, next_state, reward, terminal): # action: index (or one hot vector)
+        if np.ndim(action) > 0:
+            action = np.argmax(action)
+        with self.lock:
+            if self.n_step > 1:
+                self.add_n_step(0, state, action, next_state, reward, terminal)
+            else:
+                self.put(state, action, next_state, reward, terminal, self.discount)
+
+    def add_batch(self, states, actions, next_states, rewards, terminals):
+        # adds N transitions at once (e.g. one per env of a VecSimulator) w/ one write per array,
+        # actions: N indices (or N one hot vectors), if N > max_transitions only the last ones are kept
+        # NOTE: w/ n_step > 1 the transitions are added one by one, the i-th one to the episode of env i
+        actions = np.asarray(actions)
+        if actions.ndim > 1:
+            actions = np.argmax(actions, 1)
+        if self.n_step > 1:
+            with self.lock:
+                for i in range(actions.shape[0]):
+                    self.add_n_step(i, states[i], actions[i], next_states[i], np.ravel(rewards)[i], np.ravel(terminals)[i])
+            return
+        self.put_batch(states, actions, next_states, rewards, terminals)
+
+    def put_batch(self, states, actions, next_states, rewards, terminals):
+        # writes N transitions starting at top
+        n = min(actions.shape[0], self.max_transitions)
+        skip = actions.shape[0] - n # transitions that would be overwritten right away
+        with self.lock:
+            self.release(skip + n)
+            index = (self.top + skip + np.arange(n)) % self.max_transitions
+            self.states[index] = cast_frames(np.reshape(states, (actions.shape[0], -1))[-n:], self.store_dtype)
+            self.actions[index] = actions[-n:]
+            self.next_states[index] = cast_frames(np.reshape(next_states, (actions.shape[0], -1))[-n:], self.store_dtype)
+            self.rewards[index] = np.reshape(rewards, (-1, 1))[-n:]
+            self.terminal[index] = np.reshape(terminals, (-1, 1))[-n:]
+            self.discounts[index] = self.discount
+            self.size = min(self.size + n, self.max_transitions)
+            self.top = (self.top + skip + n) % self.max_transitions
+            self.bottom = (self.top - self.size) % self.max_transitions
+
+    def one_hot_action(self, actions):
+        actions = np.asarray(actions, dtype=int).reshape(-1)
+        one_hot_actions = np.zeros((actions.shape[0], self.act_num), dtype=np.float32)
+        one_hot_actions[np.arange(actions.shape[0]), actions] = 1
+        return one_hot_actions
+
+    def gather(self, index):
+        # the float32 minibatch (state, action, next_state, reward, terminal[, discount]) of the transitions at index
+        state      = np.asarray(self.states[index], dtype=np.float32)
+        action     = self.one_hot_action(self.actions[index])
+        next_state = np.asarray(self.next_states[index], dtype=np.float32)
+        reward     = self.rewards[index]
+        terminal   = self.terminal[index].astype(np.float32)
+        if self.n_step > 1:
+            return state, action, next_state, reward, terminal, self.discounts[index]
+        return state, action, next_state, reward, terminal
+
+    def batch_shapes(self, batch_size): # (shape, dtype) of each array sample_minibatch returns
+        state_len = self.state_siz*self.hist_len
+        shapes = [(batch_size, state_len), (batch_size, self.act_num), (batch_size, state_len), (batch_size, 1), (batch_size, 1)]
+        if self.n_step > 1:
+            shapes.append((batch_size, 1))
+        return [(shape, np.float32) for shape in shapes]
+
+    def sample_minibatch(self, batch_size=None):
+        if batch_size is None:
+            batch_size = self.batch_size
+        assert self.size > 0, "cannot sample from an empty TransitionTable"
+        index = (self.bottom + np.random.randint(0, self.size, batch_size)) % self.max_transitions
+        return self.gather(index)
+
+    def arrays(self):
+        return self.states, self.actions, self.next_states, self.rewards, self.terminal, self.discounts
+
+    def nbytes(self): # memory held by the table (on disk w/ a replay_dir)
+        return sum(array.nbytes for array in self.arrays())
+
+    def snapshot(self):
+        # persists the current contents in replay_dir, a table created on it later resumes from here
+        if self.replay_dir is None:
+            return
+        with self.lock:
+            for array in self.arrays():
+                array.flush()
+            self.write_meta(self.top, self.bottom, self.size)
+            self.mark_snapshot()
+
+    def iterate_minibatches(self, batch_size=None, num_buf=3):
+        # endless minibatches (the same as sample_minibatch() returns) built by a
+        # background thread, each one sampled uniformly from the transitions the table holds
+        # at the time it is built (so you can keep adding transitions while iterating)
+        # NOTE: only start iterating once the table holds some transitions
+        if batch_size is None:
+            batch_size = self.batch_size
+        def fill(bufs):
+            with self.lock:
+                assert self.size > 0, "cannot sample from an empty TransitionTable"
+                batch = self.sample_minibatch(batch_size)
+            for buf, array in zip(bufs, batch):
+                buf[:] = array
+            return True
+
+        shapes, dtypes = zip(*self.batch_shapes(batch_size))
+        return MinibatchPrefetcher(fill, shapes, num_buf, dtypes)
+
+
+class FrameTransitionTable(TransitionTable):
+
+    # same interface as TransitionTable, but every observed frame is only stored once:
+    # consecutive transitions share hist_len - 1 frames & next_state is the following state,
+    # so the frames go into a circular buffer of max_frames frames and each transition only
+    # keeps the (absolute) index of the last frame of its state, the state is made of the
+    # hist_len frames up to it and the next_state of the hist_len frames up to the one after it
+    # NOTE: a state that is not the previous next_state starts a new episode, its whole history
+    # NOTE: is stored (hist_len frames) before the next frame, so an episode costs hist_len + #steps frames
+    # NOTE: when the frame buffer is full, the oldest transitions whose frames get overwritten are evicted,
+    # NOTE: the default max_frames (1.25 frames per transition) holds max_transitions transitions as long as
+    # NOTE: episodes are at least 4 * hist_len steps long on average, w/ shorter ones raise max_frames
+
+    # basic funcs
+
+    def __init__(self, state_siz, act_num, hist_len,
+                       minibatch_size, max_transitions, store_dtype="float32", max_frames=None):
+        self.state_siz = state_siz
+        self.act_num = act_num
+        self.hist_len  = hist_len
+        self.batch_size = minibatch_size
+        self.max_transitions = max_transitions
+        self.store_dtype = np.dtype(store_dtype)
+        self.replay_dir = None # only kept in RAM, snapshot() does nothing
+        self.n_step = 1 # next_state is always the following state
+        if max_frames is None:
+            max_frames = max_transitions + max_transitions // 4
+        self.max_frames = max(max_frames, 2 * (hist_len + 1)) # the newest windows always stay
+
+        # memory for frames & state transitions
+        self.frames = np.zeros((self.max_frames, state_siz), dtype=self.store_dtype)
+        self.frame_top = 0 # absolute index of the next frame, frame f lives in frames[f % max_frames]
+        self.frame_ind = np.zeros(max_transitions, dtype=np.int64) # last frame of each state
+        self.actions = np.zeros(max_transitions, dtype=np.int8)
+        self.rewards = np.zeros((max_transitions, 1), dtype=np.float32)
+        self.terminal = np.zeros((max_transitions, 1), dtype=bool)
+        self.last_next_state = None # to tell whether the next state continues the episode
         self.top = 0
         self.bottom = 0
         self.size = 0
+        self.lock = threading.RLock() # guards against minibatches being built while a transition is added
 
     # helper funcs
-    def add(self, state, action, next_state, reward, terminal):
-        self.states[self.top] = state
-        self.actions[self.top] = action
-        self.next_states[self.top] = next_state
-        self.rewards[self.top] = reward
-        self.terminal[self.top] = terminal
-        if self.size == self.max_transitions:
+
+    def evict(self, frame_end):
+        # drops the oldest transitions until max_transitions - 1 are left and
+        # no transition needs a frame before frame_end - max_frames
+        while self.size > 0 and (self.size == self.max_transitions or
+                                 self.frame_ind[self.bottom] - self.hist_len + 1 < frame_end - self.max_frames):
             self.bottom = (self.bottom + 1) % self.max_transitions
-        else:
+            self.size -= 1
+
+    def put_frames(self, frames):
+        frame_ind = np.arange(self.frame_top, self.frame_top + frames.shape[0]) % self.max_frames
+        self.frames[frame_ind] = frames
+        self.frame_top += frames.shape[0]
+
+    def add(self, state, action, next_state, reward, terminal): # action: index (or one hot vector)
+        if np.ndim(action) > 0:
+            action = np.argmax(action)
+        state = cast_frames(state, self.store_dtype).reshape(self.hist_len, self.state_siz)
+        next_state = cast_frames(next_state, self.store_dtype).reshape(self.hist_len, self.state_siz)
+        with self.lock:
+            new_episode = self.last_next_state is None or not np.array_equal(state, self.last_next_state)
+            new_frames = next_state[-1:]
+            if new_episode:
+                new_frames = np.concatenate((state, new_frames))
+            self.evict(self.frame_top + new_frames.shape[0])
+            self.put_frames(new_frames)
+            self.frame_ind[self.top] = self.frame_top - 2
+            self.actions[self.top] = action
+            self.rewards[self.top] = reward
+            self.terminal[self.top] = terminal
+            self.last_next_state = next_state.copy()
             self.size += 1
-        self.top = (self.top + 1) % self.max_transitions
+            self.top = (self.top + 1) % self.max_transitions
 
-    def one_hot_action(self, actions):
-        actions = np.atleast_2d(actions)
-        one_hot_actions = np.zeros((actions.shape[0], self.act_num))
-        for i in range(len(actions)):
-            one_hot_actions[i, int(actions[i])] = 1
-        return one_hot_actions
+    def add_batch(self, states, actions, next_states, rewards, terminals):
+        # NOTE: the transitions of different envs do not continue each other, so they are added one by one
+        # NOTE: & each of them starts a new episode that stores its whole history,
+        # NOTE: use one FrameTransitionTable per env to keep the frames deduplicated
+        for transition in zip(states, actions, next_states, rewards, terminals):
+            self.add(*transition)
 
     def sample_minibatch(self, batch_size=None):
         if batch_size is None:
             batch_size = self.batch_size
-        state      = np.zeros((self.batch_size, self.state_siz*self.hist_len), dtype=np.float32)
-        action     = np.zeros((self.batch_size, self.act_num), dtype=np.float32)
-        next_state = np.zeros((self.batch_size, self.state_siz*self.hist_len), dtype=np.float32)
-        reward     = np.zeros((self.batch_size, 1), dtype=np.float32)
-        terminal   = np.zeros((self.batch_size, 1), dtype=np.float32)
-        for i in range(batch_size):
-            index = np.random.randint(self.bottom, self.bottom + self.size)
-            state[i]         = self.states.take(index, axis=0, mode='wrap')
-            action[i]        = self.actions.take(index, axis=0, mode='wrap')
-            next_state[i]    = self.next_states.take(index, axis=0, mode='wrap')
-            reward[i]        = self.rewards.take(index, axis=0, mode='wrap')
-            terminal[i]      = self.terminal.take(index, axis=0, mode='wrap')
+        assert self.size > 0, "cannot sample from an empty FrameTransitionTable"
+        index = (self.bottom + np.random.randint(0, self.size, batch_size)) % self.max_transitions
+        # frames of state & next_state: the hist_len + 1 frames up to the one after the state
+        window = self.frame_ind[index, None] + np.arange(1 - self.hist_len, 2)
+        frames = self.frames[window % self.max_frames].astype(np.float32)
+        state      = frames[:, :-1].reshape(batch_size, self.state_siz*self.hist_len)
+        action     = self.one_hot_action(self.actions[index])
+        next_state = frames[:, 1:].reshape(batch_size, self.state_siz*self.hist_len)
+        reward     = self.rewards[index]
+        terminal   = self.terminal[index].astype(np.float32)
         return state, action, next_state, reward, terminal
+
+    def arrays(self):
+        return self.frames, self.frame_ind, self.actions, self.rewards, self.terminal
@@ -0,0 +1,126 @@
+import numpy as np
+# custom modules
+from maps import maps
+
+class ValueIteration:
+
+    # exact optimal Q values of the maze MDP of maps[map_ind] for every (tgt cell, bot cell, action),
+    # w/ the rewards of Simulator.act (+1 reaching the tgt (terminal), -1 collision (bot stays), -0.04 else)
+    # cells are indexed by free cell id (row major order like Simulator.fre_pos / ObsAtlas.fre_ind)
+    # NOTE: the moves are deterministic, so the transition matrix is stored in index form, i.e. one next
+    # NOTE: cell id per (cell, action) (nxt), which is all a sparse (cell x action) x cell matrix would hold,
+    # NOTE: a Bellman backup is then a gather over all tgts, cells & actions at once
+    # NOTE: tgts are solved in chunks of tgt_chunk, memory is tgt_chunk x #cells x act_num per sweep
+    # NOTE: (for large maps pass only the tgts you need, e.g. opt.tgt_y, opt.tgt_x, the Q table itself is
+    # NOTE: #tgts x #cells x act_num)
+
+    # basic funcs
+
+    def __init__(self, map_ind, act_num=5, discount=0.99, tgt_pos=None, tol=1e-6, max_iter=10000, tgt_chunk=256):
+        self.map_ind  = map_ind
+        self.map      = maps[map_ind]
+        self.act_num  = act_num
+        self.discount = discount
+        self.act_pos_ind = np.array([[0, 0], [-1, 0], [1, 0], [0, -1], [0, 1]])[:act_num] # as in Simulator
+        self.fre_pos  = np.argwhere(self.map == 0)
+        self.fre_ind  = np.full(self.map.shape, -1, dtype=np.int64) # cell -> free cell id
+        self.fre_ind[self.fre_pos[:, 0], self.fre_pos[:, 1]] = np.arange(self.fre_pos.shape[0])
+        if tgt_pos is None:
+            tgt_pos = self.fre_pos
+        self.tgt_pos = np.asarray(tgt_pos, dtype=int).reshape(-1, 2)
+        self.tgt_ind = np.full(self.map.shape, -1, dtype=np.int64) # cell -> row of the solved tgt
+        self.tgt_ind[self.tgt_pos[:, 0], self.tgt_pos[:, 1]] = np.arange(self.tgt_pos.shape[0])
+        self.build_transitions()
+        self.q = np.zeros((self.tgt_pos.shape[0], self.fre_pos.shape[0], act_num), dtype=np.float32)
+        self.num_iter = 0
+        for lo in range(0, self.tgt_pos.shape[0], tgt_chunk):
+            hi = min(lo + tgt_chunk, self.tgt_pos.shape[0])
+            self.q[lo:hi], num_iter = self.solve(self.fre_ind[self.tgt_pos[lo:hi, 0], self.tgt_pos[lo:hi, 1]], tol, max_iter)
+            self.num_iter = max(self.num_iter, num_iter)
+        self.v = self.q.max(2)
+
+    # helper funcs
+
+    def build_transitions(self):
+        # nxt: (#cells, act_num) next cell id, collide: whether the move runs into a wall (the bot stays)
+        new_pos = self.fre_pos[:, None, :] + self.act_pos_ind[None, :, :]
+        new_ind = self.fre_ind[new_pos[..., 0], new_pos[..., 1]]
+        self.collide = new_ind < 0
+        self.nxt = np.where(self.collide, np.arange(self.fre_pos.shape[0])[:, None], new_ind)
+
+    def solve(self, tgt_ids, tol, max_iter): # value iteration for the tgts w/ the given cell ids
+        reach = self.nxt[None, :, :] == tgt_ids[:, None, None]
+        reward = np.where(reach, 1., np.where(self.collide, -1., -0.04))
+        cont = self.discount * ~reach # reaching the tgt ends the episode
+        v = np.zeros((tgt_ids.shape[0], self.fre_pos.shape[0]))
+        tgt_rows = np.arange(tgt_ids.shape[0])
+        for num_iter in range(1, max_iter + 1):
+            q = reward + cont * v[:, self.nxt]
+            new_v = q.max(2)
+            new_v[tgt_rows, tgt_ids] = 0. # the bot never starts on the tgt
+            delta = np.max(np.abs(new_v - v))
+            v = new_v
+            if delta < tol:
+                break
+        assert delta < tol, "value iteration did not converge in %d iterations (change %g >= tol %g), raise max_iter" % (max_iter, delta, tol)
+        q[tgt_rows, tgt_ids] = 0.
+        return q, num_iter
+
+    def index(self, tgt_y, tgt_x, bot_y, bot_x): # (tgt rows, bot cell ids) of (arrays of) positions
+        tgt_rows = self.tgt_ind[tgt_y, tgt_x]
+        bot_ids  = self.fre_ind[bot_y, bot_x]
+        assert np.all(tgt_rows >= 0), "tgt not solved (see tgt_pos)"
+        assert np.all(bot_ids >= 0), "bot not on a free cell"
+        return tgt_rows, bot_ids
+
+    # interfacing funcs
+
+    def lookup(self, tgt_y, tgt_x, bot_y, bot_x):
+        # optimal Q values (..., act_num) of the bot positions (scalars or arrays) for the tgt positions
+        return self.q[self.index(tgt_y, tgt_x, bot_y, bot_x)]
+
+    def value(self, tgt_y, tgt_x, bot_y, bot_x):
+        return self.v[self.index(tgt_y, tgt_x, bot_y, bot_x)]
+
+    def optimal_actions(self, tgt_y, tgt_x, bot_y, bot_x, atol=1e-5):
+        # bool mask (..., act_num) of the actions that are optimal (there can be several)
+        q = self.lookup(tgt_y, tgt_x, bot_y, bot_x)
+        return q >= q.max(-1, keepdims=True) - atol
+
+    def states(self, tgt_pos=None):
+        # all (tgt_y, tgt_x, bot_y, bot_x) w/ the bot not on the tgt, for the solved tgts (or the given ones)
+        if tgt_pos is None:
+            tgt_pos = self.tgt_pos
+        tgt_pos = np.asarray(tgt_pos, dtype=int).reshape(-1, 2)
+        pairs = np.concatenate([np.repeat(tgt_pos, self.fre_pos.shape[0], 0),
+                                np.tile(self.fre_pos, (tgt_pos.shape[0], 1))], 1)
+        return pairs[np.any(pairs[:, :2] != pairs[:, 2:], 1)]
+
+    def score(self, q_values, states, atol=1e-5):
+        # compares learned Q values (N, act_num) of the states (N, 4) (see states()) to the optimal ones:
+        #   accuracy:   fraction of states whose greedy action is optimal
+        #   regret:     mean V*(s) - Q*(s, greedy action), how much the greedy policy loses in one step
+        #   q_error:    mean absolute error of the Q values
+        q_values = np.asarray(q_values)
+        tgt_y, tgt_x, bot_y, bot_x = np.asarray(states).T
+        q_opt = self.lookup(tgt_y, tgt_x, bot_y, bot_x)
+        greedy = np.argmax(q_values, 1)
+        q_greedy = q_opt[np.arange(q_opt.shape[0]), greedy]
+        v_opt = q_opt.max(1)
+        return {"accuracy": float(np.mean(q_greedy >= v_opt - atol)),
+                "regret": float(np.mean(v_opt - q_greedy)),
+                "q_error": float(np.mean(np.abs(q_values - q_opt)))}
+
+    def score_q_fn(self, q_fn, atlas, hist_len, tgt_pos=None, batch_size=1024):
+        # scores q_fn(states) -> Q values on every state w/o running any episode, the history stacked
+        # state of each (tgt, bot) is its frame (atlas.gray) w/ zeros as the older frames (like at an
+        # episode start in train_agent.py)
+        states = self.states(tgt_pos)
+        q_values = np.zeros((states.shape[0], self.act_num), dtype=np.float32)
+        for lo in range(0, states.shape[0], batch_size):
+            batch = states[lo:lo+batch_size]
+            frames = np.stack([atlas.gray(bot_y, bot_x, tgt_y, tgt_x) for tgt_y, tgt_x, bot_y, bot_x in batch])
+            hist = np.zeros((frames.shape[0], hist_len * frames.shape[1]), dtype=np.float32)
+            hist[:, -frames.shape[1]:] = frames # the newest frame comes last
+            q_values[lo:lo+batch_size] = q_fn(hist)
+        return self.score(q_values, states)